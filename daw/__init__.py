@@ -10,26 +10,42 @@ from .base import *
 from .oscillators import *
 from .instruments import *
 from .notes import *
+from .effects import *
+from .periods import *
+from .backends import *
 
 import __main__
 
 def load(name : str = "save.daw", 
-         where : dict = __main__.__dict__):
+         where : dict = __main__.__dict__,
+         lazy : bool = True):
     """
-    Executes a DAW script in the importing namespace
+    Executes a DAW script in the importing namespace.
+    Scripts are never executed on import, a saved
+    project is restored by calling load explicitly.
 
     Args:
-        name (str):   file name of the script to execute
+        name (str):   file name of the script to execute,
+                      or of a binary project (.npz)
         where (dict): __dict__ of namespace to execute 
                       the script in
+        lazy (bool):  whether the note data of a binary
+                      project is only read once needed
     """
-    with open(name, "r") as f:
-        file = f.read()
-    exec(file, where, dict())
-
-# Load the save.daw script on import
-try:
-    load(where=globals())
-except Exception as e:
-    if type(e) != FileNotFoundError:
-        raise e
+    arrays = None
+    if name.endswith(".npz"):
+        from .project import read_project
+        file, arrays = read_project(name, lazy)
+    else:
+        with open(name, "r") as f:
+            file = f.read()
+    # The objects of the script have to end up in 'where',
+    # such that they are found by their names again
+    for n, o in globals().items():
+        if not n.startswith("_"):
+            where.setdefault(n, o)
+    where["__arrays__"] = arrays
+    try:
+        exec(compile(file, name, "exec"), where)
+    finally:
+        del where["__arrays__"]
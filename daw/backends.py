@@ -0,0 +1,269 @@
+"""
+Audio backends that drive the callback of a player
+"""
+from __future__ import annotations
+
+import numpy as np
+import threading
+from time import perf_counter
+from abc import ABC, abstractmethod
+from .base import BLOCK_SIZE, SAMPLERATE
+from typing import *
+
+# Signature of the stream callback of sounddevice,
+# (outdata, frames, time, status)
+Callback = Callable[[np.ndarray, int, Any, Any], None]
+# Blocks until the next block is rendered, returns 
+# False if no block will be rendered anymore
+Wait = Callable[[], bool]
+
+class backend(ABC):
+    """
+    Abstract base class of all backends. A backend
+    asks the callback for one block of BLOCK_SIZE
+    int16 samples whenever its device needs one.
+    """
+    def __init__(self):
+        self.callback : Callback | None = None
+        self.wait : Wait | None = None
+
+    @property
+    def opened(self) -> bool:
+        """
+        Whether the backend was opened
+        """
+        return self.callback is not None
+
+    def open(self, callback : Callback, wait : Wait | None = None):
+        """
+        Opens the device, which calls 'callback'
+        once it is started. Devices that are not 
+        bound to real time may call 'wait' to wait
+        for the next block.
+        """
+        self.callback = callback
+        self.wait = wait
+
+    @abstractmethod
+    def start(self):
+        """
+        Starts calling the callback
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def stop(self):
+        """
+        Stops calling the callback
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Stops and releases the device
+        """
+        self.stop()
+
+    @abstractmethod
+    def __repr__(self) -> str:
+        raise NotImplementedError
+
+class sounddevice_backend(backend):
+    """
+    Plays on the default output device of sounddevice.
+    PortAudio is only loaded once the backend is opened.
+    """
+    def __init__(self):
+        super().__init__()
+        self.stream : "sd.OutputStream" | None = None
+
+    def open(self, callback : Callback, wait : Wait | None = None):
+        import sounddevice as sd
+        super().open(callback, wait)
+        self.stream = sd.OutputStream(samplerate=SAMPLERATE,
+                                      blocksize=BLOCK_SIZE,
+                                      channels=1,
+                                      dtype='int16',
+                                      callback=callback)
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.callback = None
+
+    def __repr__(self) -> str:
+        return "sounddevice_backend()"
+
+class _time_info(NamedTuple):
+    """
+    Time info passed to the callback, mirrors the
+    attributes of the one of sounddevice
+    """
+    currentTime : float
+    outputBufferDacTime : float
+
+def _speed_repr(speed : float) -> str:
+    """
+    Returns code that evaluates to the speed
+    """
+    return "float(\"inf\")" if speed == float("inf") else str(speed)
+
+class null_backend(backend):
+    """
+    Device without sound that calls the callback on a
+    simulated clock. With a speed of 2 the blocks are
+    requested twice as fast as a sound card would,
+    which leaves the player less time per block and 
+    allows to test underruns. With a speed of inf 
+    every block is requested as soon as the player 
+    rendered it, such that the device runs as fast as
+    the player renders and never underruns.
+
+    The simulated clock only advances by played blocks,
+    so the simulated time does not depend on how fast 
+    the blocks are requested. The played audio only 
+    is deterministic with a speed of inf, at finite
+    speeds it depends on which blocks are rendered in
+    time.
+    """
+    def __init__(self, speed : float = 1.0):
+        super().__init__()
+        if not speed > 0:
+            raise ValueError("The speed must be positive")
+        self.speed : float = speed
+        # Number of blocks played so far
+        self.blocks : int = 0
+        self.outdata : np.ndarray = np.zeros((BLOCK_SIZE, 1), dtype=np.int16)
+        self._thread : threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @property
+    def time(self) -> float:
+        """
+        Simulated time in seconds
+        """
+        return self.blocks * BLOCK_SIZE / SAMPLERATE
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None \
+           and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """
+        Body of the device thread
+        """
+        period = BLOCK_SIZE / SAMPLERATE / self.speed
+        begin = perf_counter()
+        first = self.blocks
+        while not self._stopped.is_set() and self.running():
+            if self.speed == float("inf"):
+                # Every block waits until it is rendered
+                if self.wait is not None and not self.wait():
+                    break
+            else:
+                # Deadlines are derived from the start, such
+                # that late callbacks do not add up
+                delay = begin + (self.blocks - first) * period \
+                      - perf_counter()
+                if delay > 0 and self._stopped.wait(delay):
+                    break
+            self.callback(self.outdata, BLOCK_SIZE,
+                          _time_info(self.time, self.time), None)
+            self.blocks += 1
+            self.played(self.outdata)
+
+    def running(self) -> bool:
+        """
+        Whether the device wants more blocks
+        """
+        return True
+
+    def played(self, outdata : np.ndarray):
+        """
+        Called with every block the device played
+        """
+        pass
+
+    def __repr__(self) -> str:
+        if self.speed != 1.0:
+            return f"null_backend(speed={_speed_repr(self.speed)})"
+        return "null_backend()"
+
+class file_backend(null_backend):
+    """
+    Null device that writes the played blocks into
+    a file, including the silence of underruns.
+    With 'seconds' the device stops once the file
+    has that length.
+
+    Args:
+        path (str):      output file, .wav, .npy or raw
+                         samples for any other extension
+        seconds (float): length of the file, needed for
+                         .npy files
+        speed (float):   speed of the simulated clock, inf
+                         writes the blocks as fast as they
+                         are rendered without underruns
+    """
+    def __init__(self,
+                 path : str = "playback.wav",
+                 seconds : float | None = None,
+                 speed : float = 1.0):
+        super().__init__(speed)
+        if seconds is None and path.endswith(".npy"):
+            raise ValueError(".npy files need a length in seconds")
+        self.path : str = path
+        self.seconds : float | None = seconds
+        self.frames : int | None = None if seconds is None \
+                                   else round(seconds * SAMPLERATE)
+        self.written : int = 0
+        self.sink = None
+
+    def open(self, callback : Callback, wait : Wait | None = None):
+        from .sinks import open_sink
+        super().open(callback, wait)
+        self.written = 0
+        self.sink = open_sink(self.path, "int16", self.frames or 0)
+
+    def running(self) -> bool:
+        return self.frames is None or self.written < self.frames
+
+    def played(self, outdata : np.ndarray):
+        block = outdata[:, 0] / 32767
+        if self.frames is not None:
+            block = block[:self.frames - self.written]
+        self.sink.write(block)
+        self.written += block.shape[0]
+
+    def close(self):
+        super().close()
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        self.callback = None
+
+    def __repr__(self) -> str:
+        args = [f"\"{self.path}\""]
+        if self.seconds is not None:
+            args.append(f"seconds={self.seconds}")
+        if self.speed != 1.0:
+            args.append(f"speed={_speed_repr(self.speed)}")
+        return f"file_backend({', '.join(args)})"
@@ -4,44 +4,320 @@ Base classes
 from __future__ import annotations
 
 import numpy as np
-import sounddevice as sd
-from concurrent.futures import ThreadPoolExecutor
+import operator
+import threading
+import warnings
+from math import ceil, gcd, lcm
+from fractions import Fraction
+from time import perf_counter
+from collections import OrderedDict
+from contextlib import contextmanager
 from abc import ABC, abstractmethod
 from typing import *
 
 BLOCK_SIZE = 6_000
 SAMPLERATE = 48_000
+# Number of most recent blocks whose funk
+# evaluations are kept in the block cache
+BLOCK_CACHE_BLOCKS = 4
+# Number of blocks the player renders ahead
+# of the playhead
+LOOKAHEAD = 4
+
+class _block(NamedTuple):
+    """
+    Block that is currently evaluated by a thread
+    """
+    t : np.ndarray
+    start : int
+    dtype : np.dtype
+    values : Dict[funk, Any]
+    profiler : Any = None
+
+class _span(NamedTuple):
+    """
+    Samples [start, stop) of an offline rendering
+    and the evaluations of funks over all of them
+    """
+    start : int
+    stop : int
+    values : Dict[funk, np.ndarray]
+
+class _block_cache:
+    """
+    Cache of funk evaluations keyed on 
+    (node, block start sample, dtype). 
+
+    A funk that is called with the time array
+    of the block that is currently evaluated 
+    by the calling thread is evaluated at most 
+    once per block, no matter how often it is 
+    referenced in the graph or by how many 
+    players.
+    """
+    def __init__(self, blocks : int = BLOCK_CACHE_BLOCKS):
+        self.blocks : int = blocks
+        self.values : OrderedDict[Tuple[int, np.dtype], 
+                                  Dict[funk, Any]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @contextmanager
+    def block(
+        self, 
+        t : np.ndarray, 
+        start : int, 
+        dtype : np.dtype = np.dtype(np.float64),
+        profiler : Any = None
+    ):
+        """
+        Marks 't' as the time array of the block
+        starting at sample 'start' for the calling
+        thread, which is evaluated in 'dtype'. The 
+        evaluations are timed by 'profiler', which
+        nested blocks inherit.
+        """
+        dtype = np.dtype(dtype)
+        key = (start, dtype)
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = {}
+                while len(self.values) > self.blocks:
+                    self.values.popitem(last=False)
+            values = self.values[key]
+        previous = getattr(self.local, "block", None)
+        if profiler is None and previous is not None:
+            profiler = previous.profiler
+        self.local.block = _block(t, start, dtype, values, profiler)
+        try:
+            yield
+        finally:
+            self.local.block = previous
+
+    @contextmanager
+    def span(self, start : int, stop : int):
+        """
+        Marks the samples [start, stop) as the span of
+        the offline rendering done by the calling thread.
+        Evaluations of funks over the whole span, which
+        are added to its values, are sliced for the 
+        blocks within it instead of evaluating the funks.
+        """
+        previous = getattr(self.local, "span", None)
+        self.local.span = _span(start, stop, {})
+        try:
+            yield
+        finally:
+            self.local.span = previous
+
+    def evaluate(
+        self, 
+        node : funk, 
+        t : np.ndarray | float
+    ) -> np.ndarray | float:
+        """
+        Evaluates the node at times t, reusing the
+        result if t is the current block
+        """
+        block = getattr(self.local, "block", None)
+        if block is None or t is not block.t:
+            return node.f(t)
+        values = block.values
+        if node in values:
+            return values[node]
+        span = getattr(self.local, "span", None)
+        if span is not None and node in span.values \
+           and span.start <= block.start:
+            offset = block.start - span.start
+            value = span.values[node][offset:offset + t.shape[0]]
+            if value.shape == t.shape:
+                values[node] = value
+                return value
+        if block.profiler is None:
+            value = node.f(t)
+        else:
+            value = block.profiler.evaluate(node, t)
+        values[node] = value
+        return value
+
+    def clear(self):
+        """
+        Drops all cached evaluations
+        """
+        with self.lock:
+            self.values.clear()
+
+block_cache = _block_cache()
+
+def block_start(t : np.ndarray | float) -> int | None:
+    """
+    Returns the start sample if 't' is the time array
+    of the block that is currently evaluated by the
+    calling thread, and None otherwise. The times of
+    such a block are spaced by exactly one sample.
+    """
+    block = getattr(block_cache.local, "block", None)
+    if block is None or t is not block.t:
+        return None
+    return block.start
+
+def render_span() -> _span | None:
+    """
+    Returns the span of the offline rendering done 
+    by the calling thread, or None if the thread is
+    not rendering offline
+    """
+    return getattr(block_cache.local, "span", None)
+
+def _collect_terms(f : funk, terms : List[funk]) -> float:
+    """
+    Appends the terms of the (nested) sum f to 'terms'
+    and returns the sum of its constant terms
+    """
+    if f._op is not operator.add:
+        terms.append(f)
+        return 0.0
+    constant = 0.0
+    for o in f._operands:
+        if isinstance(o, funk):
+            constant += _collect_terms(o, terms)
+        else:
+            constant += o
+    return constant
+
+def _lcm(
+    periods : Iterable[Fraction | None]
+) -> Fraction | None:
+    """
+    Returns the least common multiple of the periods,
+    which is None if any of them is None or no period
+    is given
+    """
+    result = None
+    for p in periods:
+        if p is None:
+            return None
+        result = p if result is None else Fraction(
+            lcm(result.numerator, p.numerator),
+            gcd(result.denominator, p.denominator)
+        )
+    return result
+
+def evaluation_dtype() -> np.dtype:
+    """
+    Returns the dtype the block that is currently
+    evaluated by the calling thread is rendered in
+    """
+    block = getattr(block_cache.local, "block", None)
+    if block is None:
+        return np.dtype(np.float64)
+    return block.dtype
 
 class daw_object(ABC):
     """
     Abstract base class for all objects in 
     the DAW
     """
+    # Whether the code of the object refers to its
+    # own name, such that unnamed objects get one
+    _needs_name : bool = False
+
     def save(
         self, 
         name : str ="save.daw"
     ):
         """
         Saves the python code that generates the 
-        object
+        object. Names ending with .npz are saved as 
+        binary project, which stores note and sample
+        data as arrays.
         """
+        if name.endswith(".npz"):
+            from .project import save_project
+            save_project(self, name)
+            return
         with open(name, "w") as f:
-            f.write("#!python\n" + repr(self))
+            f.write("#!python\n" + _script(self))
+
+    def _references(self) -> Iterable[daw_object]:
+        """
+        Returns the daw objects the code of this
+        object refers to
+        """
+        return ()
 
+    @property
     @abstractmethod
+    def repr(self) -> str:
+        """
+        Returns the code of the object, which
+        refers to other objects by their names
+        """
+        raise NotImplementedError
+
     def __repr__(self) -> str:
         """
         Returns the python code that generates 
-        the object
+        the object and the named objects it 
+        refers to
         """
-        raise NotImplementedError
+        return _script(self)
+
+from .utils import _registry, _reference, _script
 
-from .utils import _get_global_daw_objects
+# Binding of the code of funks, from loose to tight
+SUM, PRODUCT, POWER, ATOM = range(4)
+
+def _arithmetic_code(root : funk) -> str:
+    """
+    Builds the code of a funk built by the arithmetic
+    in a single pass over its unnamed arithmetic 
+    operands, without recursion. Operands that bind 
+    less tightly than their bound are parenthesized.
+    """
+    # id -> (code, precedence)
+    codes : Dict[int, Tuple[str, int]] = {}
+    stack : List[Tuple[funk, bool]] = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            parts = []
+            for o, bound in zip(node._operands, node._bounds):
+                if not isinstance(o, funk):
+                    parts.append(str(o))
+                    continue
+                code, precedence = codes[id(o)]
+                parts.append(f"({code})" if precedence < bound else code)
+            codes[id(node)] = (node._repr.format(*parts), node._precedence)
+            continue
+        stack.append((node, True))
+        for o in node._operands:
+            if not isinstance(o, funk) or id(o) in codes:
+                continue
+            name = _registry.name(o)
+            if name is not None:
+                codes[id(o)] = (name, ATOM)
+            elif o._op is None:
+                codes[id(o)] = (o.repr, o._precedence)
+            else:
+                stack.append((o, False))
+    return codes[id(root)][0]
 
 class funk(daw_object):
     """
     FUNKy function object
     """
+    # Operator and operands of funks built by 
+    # the arithmetic operators. Leaf funks have 
+    # no operator.
+    _op : Callable | None = None
+    _operands : Tuple[funk | int | float, ...] = ()
+    # How tightly the code of the funk binds and the 
+    # least binding of the code of every operand that
+    # is not parenthesized
+    _precedence : int = ATOM
+    _bounds : Tuple[int, ...] = ()
+
     def __init__(
         self, 
         f : Union[Callable[[np.ndarray | float], 
@@ -73,7 +349,7 @@ class funk(daw_object):
             self._repr = f.__repr__()
         elif type(f) == str:
             self.f = eval("lambda t: " + f)
-            self._repr = f
+            self._repr = f"funk({f!r})"
         elif type(f) in {int, float}:
             self.f = lambda t: f
             self._repr = str(f)
@@ -86,19 +362,45 @@ class funk(daw_object):
     @property
     def repr(self) -> str:
         """
-        Property that wraps _repr
+        Property that wraps _repr, funks built by the
+        arithmetic format it with the code of their 
+        operands
         """
-        return self._repr
+        if self._op is None:
+            return self._repr
+        with _registry.naming():
+            return _arithmetic_code(self)
 
-    def __repr__(self):
+    def _references(self) -> List[funk]:
         """
-        Returns the python code that Generates
-        the object
+        The operands of funks built by the arithmetic
         """
-        name_of_globals = _get_global_daw_objects()
-        if self in name_of_globals:
-            return f"{name_of_globals[self]} = {self.repr}"
-        return self.repr
+        return [o for o in self._operands if isinstance(o, funk)]
+
+    @property
+    def period(self) -> Fraction | None:
+        """
+        Exact period of the funk in seconds, or None if 
+        it is not known to be periodic. Funks built by 
+        the arithmetic have the least common multiple of
+        the periods of their funk operands.
+        """
+        if self._op is None:
+            return None
+        return _lcm(o.period for o in self._operands 
+                    if isinstance(o, funk))
+
+    def periodic(
+        self, 
+        period : Fraction | float | str | None = None
+    ) -> period_cache:
+        """
+        Returns a funk that renders one period of this
+        funk once and plays it from a buffer. Without
+        'period' the detected period is used.
+        """
+        from .periods import period_cache
+        return period_cache(self, period)
 
     def __call__(
         self, 
@@ -106,9 +408,52 @@ class funk(daw_object):
     ) -> np.ndarray | float:
         """
         Evaluates the function at time t or times t
-        in form of a numpy array
+        in form of a numpy array. 
+
+        Note: Evaluations of the block that is currently
+        rendered are cached, the result must not be 
+        modified in place
         """
-        return self.f(t)
+        return block_cache.evaluate(self, t)
+
+    def _combine(
+        self,
+        op : Callable,
+        operands : Tuple[funk | int | float, ...],
+        template : str,
+        precedence : int,
+        bounds : Tuple[int, ...]
+    ) -> funk:
+        """
+        Builds a funk that applies the operator 
+        'op' to the evaluated operands and keeps 
+        track of the operands, such that the 
+        graph can be compiled later on.
+
+        The code of the funk is only built when it is
+        serialized, by formatting 'template' with the
+        code of the operands. Operands that bind less 
+        tightly than their bound are parenthesized, 
+        the funk itself binds with 'precedence'.
+        """
+        def f(t):
+            return op(*[o(t) if isinstance(o, funk) else o
+                        for o in operands])
+        combined = funk(f)
+        combined._op = op
+        combined._operands = operands
+        combined._repr = template
+        combined._precedence = precedence
+        combined._bounds = bounds
+        return combined
+
+    def compile(self) -> evaluation_plan:
+        """
+        Compiles the funk graph into a flat
+        evaluation plan that works on 
+        preallocated buffers
+        """
+        return evaluation_plan(self)
     
     def __add__(
         self, 
@@ -118,12 +463,9 @@ class funk(daw_object):
         Adds two functions or a function and a
         constant
         """ 
-        if isinstance(other, funk):
-            return funk(lambda t: self.f(t) + other.f(t),
-                        repr=f"{self.repr} + {other.repr}")
-        elif type(other) in {int, float}:
-            return funk(lambda t: self.f(t) + other,
-                    repr=f"{self.repr} + {other}")
+        if isinstance(other, funk) or type(other) in {int, float}:
+            return self._combine(operator.add, (self, other), 
+                                 "{} + {}", SUM, (SUM, SUM))
         else:
             raise ValueError("In addition, both operands "
                              "must be funk, int or float")
@@ -136,12 +478,9 @@ class funk(daw_object):
         Subtracts two functions or a function and a
         constant
         """
-        if isinstance(other, funk):
-            return funk(lambda t: self.f(t) - other(t),
-                        repr=f"{self.repr} - {other.repr}")
-        elif type(other) in {int, float}:
-            return funk(lambda t: self.f(t) - other,
-                        repr=f"{self.repr} - {other}")
+        if isinstance(other, funk) or type(other) in {int, float}:
+            return self._combine(operator.sub, (self, other), 
+                                 "{} - {}", SUM, (SUM, PRODUCT))
         else:
             raise ValueError("In subtraction, both operands "
                              "must be funk, int or float")
@@ -150,8 +489,8 @@ class funk(daw_object):
         """
         Negates the function
         """
-        return funk(lambda t: -self.f(t),
-                    repr=f"(-{self.repr})")
+        return self._combine(operator.neg, (self,), 
+                             "(-{})", ATOM, (POWER,))
 
     def __mul__(
         self, 
@@ -161,24 +500,9 @@ class funk(daw_object):
         Multiplies two functions or a function and a
         constant
         """
-        # Respect the order of operations of 
-        # self
-        if "+" in self.repr or "-" in self.repr:
-            repr = f"({self.repr})"
-        else:
-            repr = self.repr
-        if isinstance(other, funk):
-            # Respect the order of operations of
-            # other
-            if "+" in other.repr or "-" in other.repr:
-                other_repr = f"({other.repr})"
-            else:
-                other_repr = other._repr
-            return funk(lambda t: self.f(t) * other.f(t),
-                         repr=f"{repr} * {other_repr}")
-        elif type(other) in {int, float}:
-            return funk(lambda t: self.f(t) * other,
-                        repr=f"{repr} * {other}")
+        if isinstance(other, funk) or type(other) in {int, float}:
+            return self._combine(operator.mul, (self, other),
+                                 "{} * {}", PRODUCT, (PRODUCT, PRODUCT))
         else:
             raise ValueError("In multiplication, both operands "
                              "must be funk, int or float")
@@ -191,14 +515,8 @@ class funk(daw_object):
         Multiplies two functions or a function and a
         constant
         """
-        # Respect the order of operations of
-        # self
-        if "+" in self.repr or "-" in self.repr:
-            repr = f"({self.repr})"
-        else:
-            repr = self.repr
-        return funk(lambda t: other * self.f(t),
-                    repr=f"{other} * {repr}")
+        return self._combine(operator.mul, (other, self),
+                             "{} * {}", PRODUCT, (PRODUCT, PRODUCT))
 
     def __truediv__(
         self, 
@@ -208,14 +526,11 @@ class funk(daw_object):
         Divides two functions or a function and a
         constant
         """
-        if isinstance(other, funk):
-            return funk(lambda t: self.f(t) / other.f(t),
-                         repr=f"{self.repr}/{other.repr}")
-        elif type(other) in {int, float}:
-            if other == 0:
-                raise ZeroDivisionError("Division by zero")
-            return funk(lambda t: self.f(t) / other,
-                        repr=f"{self.repr}/{other}")
+        if type(other) in {int, float} and other == 0:
+            raise ZeroDivisionError("Division by zero")
+        if isinstance(other, funk) or type(other) in {int, float}:
+            return self._combine(operator.truediv, (self, other),
+                                 "{}/{}", PRODUCT, (PRODUCT, POWER))
         else:
             raise TypeError(
                 "Devision is only possible amongst funks, "
@@ -231,11 +546,15 @@ class funk(daw_object):
         function or a constant
         """
         if isinstance(other, funk):
-            return funk(lambda t: self.f(t) ** other.f(t),
-                         repr=f"{self.repr}**({other.repr})")
-        return funk(lambda t: self.f(t) ** other,
-                    repr=f"{self.repr}**{other}")
+            return self._combine(operator.pow, (self, other),
+                                 "{}**({})", POWER, (ATOM, SUM))
+        return self._combine(operator.pow, (self, other),
+                             "{}**{}", POWER, (ATOM, SUM))
 
+from .backends import backend, sounddevice_backend
+from .compiler import evaluation_plan
+from .profiling import profiler
+from .recording import recorder
 from .utils import _indent_string
 
 class player(funk):
@@ -243,25 +562,101 @@ class player(funk):
     A Player that evaluats funks 
     and plays them on the speakers
     """
-    def __init__(self):
+    _needs_name = True
+
+    def __init__(
+        self, 
+        lookahead : int = LOOKAHEAD,
+        dtype : str | np.dtype = "float64",
+        workers : int = 1,
+        pool : str = "thread",
+        backend : backend | None = None
+    ):
         """
-        Sets up the output stream
-        and initializes some variables
+        Initializes some variables. The output 
+        stream is opened on the first call of play
+
+        Args:
+            lookahead (int): number of blocks that are
+                             rendered ahead of the playhead
+            dtype:           float dtype the inputs are 
+                             evaluated in, float32 halves
+                             the memory traffic per block
+            workers (int):   number of threads the independent
+                             branches of the inputs are 
+                             evaluated on
+            pool (str):      'thread' or 'process'. Process 
+                             workers rebuild the branches from
+                             their repr and also speed up funks
+                             that hold the GIL
+            backend:         device that plays the blocks,
+                             sounddevice by default. A 
+                             null_backend or file_backend
+                             plays without a sound card.
         """
+        if lookahead < 1:
+            raise ValueError("The lookahead must be at least "
+                             "one block")
+        self.dtype : np.dtype = np.dtype(dtype)
+        if self.dtype not in {np.dtype(np.float32), 
+                              np.dtype(np.float64)}:
+            raise ValueError("The player evaluates either in "
+                             "float32 or float64")
         self.inputs : List[funk] = []
-        self.t : float = 0.0
-        self.block = np.linspace(0, BLOCK_SIZE / SAMPLERATE, 
-                                 BLOCK_SIZE)
-        self.os = sd.OutputStream(samplerate=SAMPLERATE, 
-                                  blocksize=BLOCK_SIZE,
-                                  channels=1, 
-                                  dtype='int16', 
-                                  callback=self.tick)
-        self.executor = ThreadPoolExecutor()
-        self.evaluation = np.zeros(BLOCK_SIZE, dtype=np.int16)
-        self.all_outdata = []
+        # The clock of the player is the index of the 
+        # sample at the playhead
+        self.sample : int = 0
+        self.block = np.arange(BLOCK_SIZE, dtype=np.int64)
+        self.backend : backend = backend if backend is not None \
+                                 else sounddevice_backend()
+        # Optional recording of the played blocks
+        self.recorder : recorder | None = None
+        # Independent branches of the inputs, which are 
+        # the terms of their top level sums, the sum of
+        # their constant terms and the inputs they were 
+        # collected from
+        self._branches : List[funk] = []
+        self._constant : float = 0.0
+        self._branched_inputs : Tuple[funk, ...] = ()
+        # Compiled plans of the branches and the
+        # preallocated buffers of the evaluation
+        self._compiled : bool = False
+        self._plans : List[evaluation_plan] | None = None
+        self._mix_buffer = np.zeros(BLOCK_SIZE, dtype=self.dtype)
+        self._rows : np.ndarray = np.zeros((0, BLOCK_SIZE), 
+                                           dtype=self.dtype)
+        if pool not in {"thread", "process"}:
+            raise ValueError("pool must be 'thread' or 'process'")
+        self.workers : int = workers
+        self.pool : str = pool
+        # Worker pools, their modules are only 
+        # imported once they are needed
+        self._pool : "ThreadPoolExecutor" | None = None
+        self._processes : "process_pool" | None = None
+        # Whether the branches could not be rebuilt in 
+        # processes and are evaluated on threads instead
+        self._process_fallback : bool = False
+        self._pools_lock = threading.RLock()
+        # Ring of prerendered blocks. Block i since the
+        # last reset is stored at i % lookahead. The
+        # producer thread renders block _produced next, 
+        # the callback plays block _consumed next.
+        self.lookahead : int = lookahead
+        self._ring = np.zeros((lookahead, BLOCK_SIZE), dtype=np.int16)
+        self._produced : int = 0
+        self._consumed : int = 0
+        self._generation : int = 0
+        self._condition = threading.Condition()
+        self._producer : threading.Thread | None = None
+        self._running : bool = False
+        # Callbacks that found no rendered block and 
+        # blocks that were rendered too late to be played
+        self.underruns : int = 0
+        self.late_blocks : int = 0
+        # Optional instrumentation of the evaluation
+        self.profiler : profiler | None = None
 
-    def __call__(
+    def f(
         self, t : np.ndarray | float
     ) -> np.ndarray | float:
         """
@@ -270,10 +665,16 @@ class player(funk):
         chain and listen to parts of the 
         signal
         """
-        return np.sum(
-            np.array([f(t) for f in self.inputs]),
-            axis=0
-        )
+        if not isinstance(t, np.ndarray):
+            return np.sum([f(t) for f in self.inputs])
+        return self._mix(t, np.zeros(t.shape, dtype=evaluation_dtype()))
+
+    @property
+    def t(self) -> float:
+        """
+        Time of the playhead in seconds
+        """
+        return self.sample / SAMPLERATE
 
     def __getitem__(
             self,
@@ -285,24 +686,261 @@ class player(funk):
         """
         return self.inputs[idx]
 
+    def compile(self) -> List[evaluation_plan]:
+        """
+        Compiles all inputs into flat evaluation 
+        plans, which are used for all subsequent 
+        evaluations. Plugging and unplugging keeps
+        the plans up to date.
+        """
+        self._compiled = True
+        self._branched_inputs = ()
+        self._evaluators()
+        return self._plans
+
+    def _evaluators(self) -> List[funk | evaluation_plan]:
+        """
+        Returns the funks or compiled plans of the 
+        branches, which are rebuilt whenever the 
+        inputs changed
+        """
+        inputs = tuple(self.inputs)
+        if inputs != self._branched_inputs:
+            with self._pools_lock:
+                branches = []
+                self._constant = sum(_collect_terms(f, branches) 
+                                     for f in inputs)
+                self._branches = branches
+                self._plans = [f.compile() for f in branches] \
+                              if self._compiled else None
+                self._branched_inputs = inputs
+                if self._processes is not None:
+                    self._processes.close()
+                    self._processes = None
+                self._process_fallback = False
+        return self._plans if self._plans is not None \
+               else self._branches
+
+    def _branch_script(self) -> str:
+        """
+        Builds the python code that reconstructs the
+        branches in a list called __branches__
+        """
+        with _registry.naming():
+            script = "from daw import *\n"
+            definitions = _script(*self._branches, expressions=False)
+            if definitions:
+                script += definitions + "\n"
+            script += "__branches__ = [\n"
+            for f in self._branches:
+                script += _indent_string(_reference(f), 4) + ",\n"
+            script += "]\n"
+        if self._compiled:
+            script += "__branches__ = [f.compile() for f in __branches__]\n"
+        return script
+
+    def _evaluate_branch(
+        self,
+        f : funk | evaluation_plan,
+        t : np.ndarray,
+        out : np.ndarray,
+        start : int | None,
+        dtype : np.dtype
+    ):
+        """
+        Evaluates a branch on a worker thread, which 
+        takes part in the block of the calling thread
+        """
+        if start is None:
+            np.copyto(out, f(t), casting="same_kind")
+            return
+        with block_cache.block(t, start, dtype, self.profiler):
+            np.copyto(out, f(t), casting="same_kind")
+
+    def _mix(
+        self,
+        t : np.ndarray,
+        out : np.ndarray
+    ) -> np.ndarray:
+        """
+        Sums the inputs evaluated at times t
+        into 'out'. With multiple workers every 
+        branch is evaluated into its own row, 
+        which are reduced at the end.
+        """
+        evaluators = self._evaluators()
+        start = block_start(t)
+        processes = None
+        if (self.pool == "process" and start is not None 
+            and len(evaluators) > 0 and t.shape == (BLOCK_SIZE,)):
+            processes = self._process_pool(len(evaluators), out.dtype)
+        if processes is not None:
+            processes.render(start, out)
+        elif self.workers > 1 and len(evaluators) > 1:
+            pool = self._thread_pool()
+            shape = (len(evaluators),) + t.shape
+            if self._rows.shape != shape or self._rows.dtype != out.dtype:
+                self._rows = np.zeros(shape, dtype=out.dtype)
+            dtype = evaluation_dtype()
+            for future in [pool.submit(self._evaluate_branch, f, t, 
+                                             row, start, dtype)
+                           for f, row in zip(evaluators, self._rows)]:
+                future.result()
+            np.sum(self._rows, axis=0, out=out)
+        else:
+            out[...] = 0
+            for f in evaluators:
+                np.add(out, f(t), out=out)
+        if self._constant:
+            out += self._constant
+        return out
+
+    def _thread_pool(self) -> "ThreadPoolExecutor":
+        """
+        Returns the worker threads, which are started
+        on the first call
+        """
+        with self._pools_lock:
+            if self._pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._pool = ThreadPoolExecutor(self.workers)
+            return self._pool
+
+    def _process_pool(
+        self, 
+        branches : int, 
+        dtype : np.dtype
+    ) -> "process_pool" | None:
+        """
+        Returns the worker processes of the branches,
+        which are started on the first call. If the 
+        branches cannot be rebuilt from their code in 
+        the workers, a warning is issued and None is 
+        returned, the branches are then evaluated on 
+        threads until the inputs change.
+        """
+        with self._pools_lock:
+            if self._processes is not None or self._process_fallback:
+                return self._processes
+            from .processes import process_pool
+            from concurrent.futures.process import BrokenProcessPool
+            script = self._branch_script()
+            try:
+                compile(script, "<branches>", "exec")
+                self._processes = process_pool(script, branches,
+                                               self.workers, dtype)
+            except (SyntaxError, BrokenProcessPool) as e:
+                warnings.warn("The branches of the player cannot be "
+                              "rebuilt in worker processes, funks "
+                              "like funk(lambda t: ...) have no code. "
+                              f"They are evaluated on threads ({e!r})",
+                              RuntimeWarning)
+                self._process_fallback = True
+            return self._processes
+
+    def _start_pools(self):
+        """
+        Starts the worker pools of the current branches
+        on the calling thread, processes must not be 
+        forked from the producer thread
+        """
+        evaluators = self._evaluators()
+        if self.pool == "process" and len(evaluators) > 0:
+            self._process_pool(len(evaluators), self.dtype)
+        elif self.workers > 1 and len(evaluators) > 1:
+            self._thread_pool()
+
+    def _render_block(
+        self,
+        start : int,
+        out : np.ndarray
+    ) -> np.ndarray:
+        """
+        Evaluates the inputs at the block starting
+        at sample 'start' and clips the result 
+        into 'out'
+        """
+        # Times are derived from the exact sample index,
+        # such that adjacent blocks never overlap
+        t_eval = (start + self.block) / SAMPLERATE
+        profiler = self.profiler
+        if profiler is not None:
+            begin = perf_counter()
+        with block_cache.block(t_eval, start, self.dtype, profiler):
+            evaluation = self._mix(t_eval, out)
+        np.clip(evaluation, -1, 1, out=evaluation)
+        if profiler is not None:
+            profiler.block(perf_counter() - begin)
+        return evaluation
+
     def _evaluate(
         self, 
-        t: float
+        start: int,
+        out: np.ndarray
     ):
         """
         Evaluates the inputs at the block
-        starting at time t, brings the result
-        into the right format for the output stream
-        and stores it in a buffer variable
-        """
-        t_eval = t + self.block
-        evaluation = np.sum(
-            np.array([f(t_eval) for f in self.inputs]),
-            axis=0
-        )
-        evaluation = np.clip(evaluation, -1, 1)
-        evaluation = np.int16(evaluation * 32767)
-        self.evaluation = evaluation
+        starting at sample 'start' and brings the 
+        result into the right format for the output 
+        stream
+        """
+        evaluation = self._render_block(start, self._mix_buffer)
+        np.multiply(evaluation, 32767, out=evaluation)
+        np.copyto(out, evaluation, casting="unsafe")
+
+    def _produce(self):
+        """
+        Body of the producer thread, which keeps the
+        ring filled with the blocks ahead of the
+        playhead
+        """
+        try:
+            self._produce_blocks()
+        finally:
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
+
+    def _produce_blocks(self):
+        """
+        Renders blocks into the ring until the
+        player is stopped
+        """
+        while True:
+            with self._condition:
+                while (self._running and self._produced 
+                       - self._consumed >= self.lookahead):
+                    self._condition.wait()
+                if not self._running:
+                    return
+                # Blocks the callback already skipped are 
+                # not rendered at all
+                block = max(self._produced, self._consumed)
+                generation = self._generation
+            # The slot is only read once the block is 
+            # published, so it can be written without the lock
+            self._evaluate(block * BLOCK_SIZE,
+                           self._ring[block % self.lookahead])
+            with self._condition:
+                if generation != self._generation:
+                    continue
+                if block < self._consumed:
+                    self.late_blocks += 1
+                    if self.profiler is not None:
+                        self.profiler.deadline_misses += 1
+                self._produced = block + 1
+                self._condition.notify_all()
+
+    def _wait_block(self) -> bool:
+        """
+        Waits until the block the callback plays next
+        is rendered, returns False if the player stopped
+        rendering
+        """
+        with self._condition:
+            while self._running and self._consumed >= self._produced:
+                self._condition.wait()
+            return self._consumed < self._produced
 
     def tick(self, 
              outdata: np.ndarray, 
@@ -310,12 +948,26 @@ class player(funk):
              time: "CData",
              status: sd.CallbackFlags):
         """
-        The callback function for the output stream
+        The callback function for the output stream.
+        Plays the next prerendered block or silence,
+        if the block is not rendered yet.
         """
-        outdata[:, 0] = self.evaluation
-        self.all_outdata.append(outdata.copy())
-        self.executor.submit(self._evaluate, self.t)
-        self.t += BLOCK_SIZE / SAMPLERATE
+        with self._condition:
+            if self._consumed < self._produced:
+                outdata[:, 0] = self._ring[self._consumed 
+                                           % self.lookahead]
+            else:
+                outdata.fill(0)
+                self.underruns += 1
+                if self.profiler is not None:
+                    self.profiler.underruns += 1
+            self._consumed += 1
+            self.sample = self._consumed * BLOCK_SIZE
+            self._condition.notify_all()
+        if self.recorder is not None:
+            self.recorder.write(outdata[:, 0])
+        if status and self.profiler is not None:
+            self.profiler.status(status)
 
     def plug(self, other: funk | Iterable[funk]):
         """
@@ -333,6 +985,8 @@ class player(funk):
         else:
             raise ValueError(f"Expected funk or iterable of funks,"
                              f" got {type(other)}")
+        if self._running:
+            self._start_pools()
     
     def __lt__(self, other):
         """
@@ -346,46 +1000,187 @@ class player(funk):
         """
         return self.unplug(other)
 
+    def _references(self) -> List[funk]:
+        return self.inputs
+
     @property
     def repr(self) -> str:
         """
-        Builds code that generates the player together
-        with its funk graph
+        Builds code that generates the player and
+        plugs its inputs, named inputs are referred
+        to by their names
         """
-        name_of_global = _get_global_daw_objects()
-        name_of_self = name_of_global.pop(self)
+        name_of_self = _registry.name(self, generate=True)
         repr = f"{name_of_self} < (\n"
         for f in self.inputs:
-            if f in name_of_global:
-                repr = f"{f.__repr__()}\n"\
-                     + repr \
-                     + _indent_string(
-                        name_of_global[f], 4
-                       )
-            else:
-                repr += _indent_string(f.__repr__(), 4)                    
-            repr += ",\n"
+            repr += _indent_string(_reference(f), 4) + ",\n"
         repr += ")"
-        repr = f"player()\n" + repr
+        active_args = []
+        if self.lookahead != LOOKAHEAD:
+            active_args.append(f"lookahead={self.lookahead}")
+        if self.dtype != np.float64:
+            active_args.append(f"dtype=\"{self.dtype.name}\"")
+        if self.workers != 1:
+            active_args.append(f"workers={self.workers}")
+        if self.pool != "thread":
+            active_args.append(f"pool=\"{self.pool}\"")
+        if not isinstance(self.backend, sounddevice_backend):
+            active_args.append(f"backend={self.backend!r}")
+        repr = f"player({', '.join(active_args)})\n" + repr
         return repr
 
+    def render(
+        self,
+        seconds : float,
+        path : str = "render.wav",
+        dtype : str | np.dtype = "int16",
+        start : float = 0.0
+    ) -> float:
+        """
+        Renders the inputs as fast as possible into a
+        file without playing them. The blocks are 
+        streamed into the file one by one.
+
+        Args:
+            seconds (float): length of the rendering
+            path (str):      output file, .wav, .npy or 
+                             raw samples for any other 
+                             extension
+            dtype:           sample format of the file
+            start (float):   time the rendering starts at
+
+        Returns:
+            The reached real-time factor
+        """
+        from .sinks import open_sink
+        frames = round(seconds * SAMPLERATE)
+        first = round(start * SAMPLERATE)
+        buffer = np.zeros(BLOCK_SIZE, dtype=self.dtype)
+        # The graph may have changed since the cached
+        # blocks were evaluated
+        block_cache.clear()
+        begin = perf_counter()
+        with open_sink(path, dtype, frames) as sink, \
+             block_cache.span(first, first + frames):
+            for i in range(ceil(frames / BLOCK_SIZE)):
+                block = self._render_block(first + i * BLOCK_SIZE, 
+                                           buffer)
+                sink.write(block[:frames - i * BLOCK_SIZE])
+        elapsed = perf_counter() - begin
+        return seconds / elapsed if elapsed > 0 else float("inf")
+
+    def record(
+        self,
+        seconds : float = 60.0,
+        path : str | None = None
+    ) -> recorder:
+        """
+        Starts recording the played signal. Without
+        a path the last 'seconds' are kept in memory,
+        with a path the first 'seconds' are written 
+        into a memory mapped file.
+        """
+        self.recorder = recorder(seconds, path)
+        return self.recorder
+
+    def stop_recording(self) -> recorder | None:
+        """
+        Stops the recording and returns the recorder
+        """
+        stopped = self.recorder
+        self.recorder = None
+        return stopped
+
+    def profile(self) -> profiler:
+        """
+        Starts collecting the evaluation time of every 
+        funk, the render latencies of the blocks and 
+        the problems of the output stream
+        """
+        self.profiler = profiler()
+        return self.profiler
+
+    def stop_profiling(self) -> profiler | None:
+        """
+        Stops the profiling and returns the profiler, 
+        whose stats stay available
+        """
+        stopped = self.profiler
+        self.profiler = None
+        return stopped
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the statistics collected since 
+        profile was called
+        """
+        if self.profiler is None:
+            raise RuntimeError("The player is not profiled, "
+                               "call profile first")
+        return self.profiler.stats()
+
     def play(self):
         """
         Lets the player play
         """
-        self.os.start()
+        if not self.backend.opened:
+            self.backend.open(self.tick, self._wait_block)
+        self._start_pools()
+        with self._condition:
+            if not self._running:
+                block_cache.clear()
+                self._running = True
+                self._producer = threading.Thread(target=self._produce,
+                                                  daemon=True)
+                self._producer.start()
+            # Fill the ring before the stream starts
+            while (self._running and self._produced 
+                   - self._consumed < self.lookahead):
+                self._condition.wait()
+            if not self._running:
+                raise RuntimeError("Rendering the inputs of the "
+                                   "player failed")
+        self.backend.start()
 
     def stop(self):
         """
         Stops the player
         """
-        self.os.stop()
+        self.backend.stop()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._producer is not None:
+            self._producer.join()
+            self._producer = None
+
+    def close(self):
+        """
+        Stops the player and releases its backend 
+        and worker pools
+        """
+        self.stop()
+        self.backend.close()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._processes is not None:
+            self._processes.close()
+            self._processes = None
 
     def reset(self):
         """
         Resets the player to time 0
         """
-        self.t = 0.0
+        with self._condition:
+            self.sample = 0
+            self._produced = 0
+            self._consumed = 0
+            self._generation += 1
+            self.underruns = 0
+            self.late_blocks = 0
+            self._condition.notify_all()
+        block_cache.clear()
 
     def unplug(self, idx: None | int = None) -> funk | List[funk]:
         """
@@ -393,7 +1188,10 @@ class player(funk):
         if index is not given
         """
         if idx is not None:
-            return self.inputs.pop(idx)
-        removed = self.inputs
-        self.inputs = []
+            removed = self.inputs.pop(idx)
+        else:
+            removed = self.inputs
+            self.inputs = []
+        if self._running:
+            self._start_pools()
         return removed
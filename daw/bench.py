@@ -0,0 +1,217 @@
+"""
+Benchmarks of canonical workloads without an audio device.
+
+Usage:
+    python -m daw.bench [workload ...] [--seconds 10]
+                        [--output results.json]
+                        [--compare baseline.json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+from time import perf_counter
+from .base import funk, player, block_cache, BLOCK_SIZE, SAMPLERATE
+from .oscillators import sine
+from .instruments import epiano, vinal
+from .notes import Pitcher, Sequencer, semitone, frequency
+from typing import *
+
+BENCH_SECONDS = 10.0
+MINOR = [0, 2, 3, 5, 7, 8, 10]
+
+def _readme_sequence() -> funk:
+    """
+    C-minor example of the README with a fixed seed
+    """
+    choice = random.Random(0).choice
+    pi = Pitcher()
+    pi < epiano(frequency(semitone("C4")))
+    s = Sequencer(note_length=1/4)
+    for i in range(16):
+        s.sequence[i] += choice(MINOR)
+    pi < s
+    return pi
+
+def _notes(notes : int) -> funk:
+    """
+    Pitcher playing a sequence of 'notes' notes within
+    4 beats, such that every block holds more notes as
+    their number increases
+    """
+    choice = random.Random(0).choice
+    pi = Pitcher()
+    pi < epiano(frequency(semitone("C4")))
+    s = Sequencer(num_notes=notes, note_length=4 / notes)
+    for i in range(notes):
+        s.sequence[i] += choice(MINOR)
+    pi < s
+    return pi
+
+# Builders of the funks of the workloads
+WORKLOADS : Dict[str, Callable[[], funk]] = {
+    "readme-sine": lambda: sine(220),
+    "readme-product": lambda: sine(220) * sine(1/0.5),
+    "readme-sequence": _readme_sequence,
+    "epiano-8": lambda: epiano(220, harmonics=8),
+    "epiano-32": lambda: epiano(220, harmonics=32),
+    "pitcher-16": lambda: _notes(16),
+    "pitcher-64": lambda: _notes(64),
+    "pitcher-256": lambda: _notes(256),
+    "vinal": lambda: vinal(),
+}
+
+def bench(
+    workload : str,
+    seconds : float = BENCH_SECONDS,
+    dtype : str = "float64",
+    workers : int = 1,
+    compile : bool = False
+) -> Dict[str, Any]:
+    """
+    Renders 'seconds' of a workload block by block
+    without playing it and returns the measurements.
+
+    Tracing the memory slows numpy down too much to be
+    part of the timing, the peak memory is measured in
+    a second rendering that builds the workload and 
+    the player from scratch, such that it includes the
+    plans, caches and notes built along the way.
+
+    Returns:
+        Dictionary with the rendered blocks, the elapsed
+        time, blocks per second, the real-time factor
+        and the peak memory in bytes
+    """
+    if workload not in WORKLOADS:
+        raise ValueError(f"Unknown workload {workload!r}, expected "
+                         f"one of {', '.join(WORKLOADS)}")
+    blocks = max(1, round(seconds * SAMPLERATE / BLOCK_SIZE))
+
+    def run() -> float:
+        """
+        Builds the workload and renders it, returns the
+        time of all blocks but the first one
+        """
+        block_cache.clear()
+        p = player(dtype=dtype, workers=workers)
+        try:
+            p < WORKLOADS[workload]()
+            if compile:
+                p.compile()
+            out = np.zeros(BLOCK_SIZE, dtype=p.dtype)
+            # The first block builds lazy state like plans and pools
+            p._render_block(0, out)
+            begin = perf_counter()
+            for i in range(1, blocks + 1):
+                p._render_block(i * BLOCK_SIZE, out)
+            return perf_counter() - begin
+        finally:
+            p.close()
+
+    elapsed = run()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    rendered = blocks * BLOCK_SIZE / SAMPLERATE
+    return {
+        "workload": workload,
+        "blocks": blocks,
+        "elapsed": elapsed,
+        "blocks_per_second": blocks / elapsed,
+        "realtime_factor": rendered / elapsed,
+        "peak_memory": peak,
+    }
+
+def _commit() -> str | None:
+    """
+    Returns the git commit of the working directory
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _compare(results : List[Dict[str, Any]], baseline : Dict[str, Any]):
+    """
+    Prints the change of the real-time factors
+    relative to a baseline
+    """
+    before = {r["workload"]: r for r in baseline["results"]}
+    print(f"\ncompared to {baseline.get('commit') or 'baseline'}:")
+    for r in results:
+        if r["workload"] not in before:
+            continue
+        ratio = r["realtime_factor"] / before[r["workload"]]["realtime_factor"]
+        print(f"{r['workload']:<16} {ratio:7.2f}x")
+
+def main(argv : List[str] | None = None):
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m daw.bench",
+        description="Times canonical DawTTY workloads without "
+                    "an audio device"
+    )
+    parser.add_argument("workloads", nargs="*", default=list(WORKLOADS),
+                        help=f"workloads to run, out of "
+                             f"{', '.join(WORKLOADS)}")
+    parser.add_argument("--seconds", type=float, default=BENCH_SECONDS,
+                        help="rendered seconds per workload")
+    parser.add_argument("--dtype", default="float64",
+                        choices=["float32", "float64"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--compile", action="store_true",
+                        help="compile the inputs of the player")
+    parser.add_argument("--output", help="file to write the JSON to, "
+                                         "printed if not given")
+    parser.add_argument("--compare", help="JSON file of an earlier run "
+                                          "to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for workload in args.workloads:
+        result = bench(workload, args.seconds, args.dtype,
+                       args.workers, args.compile)
+        results.append(result)
+        print(f"{workload:<16} {result['blocks_per_second']:9.1f} blocks/s "
+              f"{result['realtime_factor']:9.1f}x real-time "
+              f"{result['peak_memory'] / 2**20:8.2f} MiB",
+              file=sys.stderr)
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "block_size": BLOCK_SIZE,
+        "samplerate": SAMPLERATE,
+        "seconds": args.seconds,
+        "dtype": args.dtype,
+        "workers": args.workers,
+        "compile": args.compile,
+        "results": results,
+    }
+    if args.output is None:
+        print(json.dumps(report, indent=4))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            _compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
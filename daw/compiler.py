@@ -0,0 +1,152 @@
+"""
+Compilation of funk graphs into flat evaluation plans
+"""
+from __future__ import annotations
+
+import numpy as np
+import operator
+from .base import funk, evaluation_dtype
+from typing import *
+
+# Numpy ufuncs that implement the operators
+# used by the funk arithmetic
+UFUNCS : Dict[Callable, np.ufunc] = {
+    operator.add: np.add,
+    operator.sub: np.subtract,
+    operator.mul: np.multiply,
+    operator.truediv: np.true_divide,
+    operator.pow: np.power,
+    operator.neg: np.negative,
+}
+
+class evaluation_plan:
+    """
+    Flat evaluation plan of a funk graph.
+
+    The graph is walked once. Every node that was
+    built by the funk arithmetic becomes a single
+    ufunc call that writes into a preallocated
+    scratch buffer, all other funks are evaluated
+    as leaves. Nodes that are referenced multiple
+    times are only evaluated once.
+    """
+    def __init__(self, root : funk):
+        self.root : funk = root
+        # Leaf funks and the value slot they fill
+        self.leaves : List[Tuple[funk, int]] = []
+        # Steps of the form (ufunc, arguments, buffer, slot)
+        # where an argument is either a slot index or a
+        # constant
+        self.steps : List[Tuple[np.ufunc,
+                                Tuple[Tuple[bool, Any], ...],
+                                int,
+                                int]] = []
+        self.num_buffers : int = 0
+        self.buffers : List[np.ndarray] = []
+        self.num_slots : int = 0
+        self.result : int = self._build()
+
+    def _build(self) -> int:
+        """
+        Orders the graph topologically, assigns value
+        slots and scratch buffers and returns the slot
+        of the root
+        """
+        # Post order of the operator nodes
+        order : List[funk] = []
+        slot_of : Dict[funk, int] = {}
+        stack : List[Tuple[funk, bool]] = [(self.root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in slot_of:
+                continue
+            if node._op is None:
+                slot_of[node] = self.num_slots
+                self.leaves.append((node, self.num_slots))
+                self.num_slots += 1
+            elif expanded:
+                slot_of[node] = self.num_slots
+                order.append(node)
+                self.num_slots += 1
+            else:
+                stack.append((node, True))
+                for o in reversed(node._operands):
+                    if isinstance(o, funk) and o not in slot_of:
+                        stack.append((o, False))
+
+        # Last step that reads a node
+        last_use : Dict[funk, int] = {}
+        for i, node in enumerate(order):
+            for o in node._operands:
+                if isinstance(o, funk):
+                    last_use[o] = i
+
+        # Assign scratch buffers, a buffer is released
+        # after the last step reading it
+        buffer_of : Dict[funk, int] = {}
+        free : List[int] = []
+        for i, node in enumerate(order):
+            released = [o for o in dict.fromkeys(node._operands)
+                        if isinstance(o, funk)
+                        and o in buffer_of
+                        and last_use[o] == i
+                        and o is not self.root]
+            free.extend(buffer_of[o] for o in released)
+            if free:
+                buffer_of[node] = free.pop()
+            else:
+                buffer_of[node] = self.num_buffers
+                self.num_buffers += 1
+            arguments = tuple(
+                (True, slot_of[o]) if isinstance(o, funk)
+                else (False, o)
+                for o in node._operands
+            )
+            self.steps.append((UFUNCS[node._op],
+                               arguments,
+                               buffer_of[node],
+                               slot_of[node]))
+        return slot_of[self.root]
+
+    def _prepare(self, t : np.ndarray):
+        """
+        (Re)allocates the scratch buffers if the
+        block shape or evaluation dtype changed
+        """
+        dtype = evaluation_dtype()
+        if (len(self.buffers) != self.num_buffers
+            or (self.buffers and (self.buffers[0].shape != t.shape
+                                  or self.buffers[0].dtype != dtype))):
+            self.buffers = [np.empty(t.shape, dtype=dtype)
+                            for _ in range(self.num_buffers)]
+
+    def __call__(
+        self,
+        t : np.ndarray | float
+    ) -> np.ndarray | float:
+        """
+        Evaluates the plan at the times t.
+
+        Note: The returned array is a scratch buffer
+        of the plan and is overwritten on the next call
+        """
+        if not isinstance(t, np.ndarray):
+            return self.root(t)
+        self._prepare(t)
+        values : List[Any] = [None] * self.num_slots
+        for leaf, slot in self.leaves:
+            values[slot] = leaf(t)
+        buffers = self.buffers
+        for ufunc, arguments, buffer, slot in self.steps:
+            values[slot] = ufunc(
+                *[values[a] if is_slot else a
+                  for is_slot, a in arguments],
+                out=buffers[buffer]
+            )
+        return values[self.result]
+
+    def __repr__(self) -> str:
+        return (f"evaluation_plan({self.root.repr}, "
+                f"leaves={len(self.leaves)}, "
+                f"steps={len(self.steps)}, "
+                f"buffers={self.num_buffers})")
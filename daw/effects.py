@@ -0,0 +1,431 @@
+"""
+Effects that keep state across blocks
+"""
+from __future__ import annotations
+
+import numpy as np
+import wave
+from math import ceil
+from .base import funk, block_cache, block_start, render_span, \
+                  evaluation_dtype, _span, BLOCK_SIZE, SAMPLERATE
+from .utils import _reference, _array_store
+from typing import *
+
+DELAY_LINE_MAX_DELAY = 2.0
+
+class _history:
+    """
+    Ring buffer of the most recent samples of a signal,
+    addressed by absolute sample index. Samples that were
+    never written read as zero.
+    """
+    def __init__(self, capacity : int):
+        self.capacity : int = capacity
+        self.buffer : np.ndarray = np.zeros(capacity)
+        # Samples [begin, end) are held by the buffer
+        self.begin : int = 0
+        self.end : int = 0
+
+    def holds(self, start : int, stop : int) -> bool:
+        """
+        Whether the samples [start, stop) are written
+        """
+        return self.begin <= start and stop <= self.end
+
+    def write(self, start : int, values : np.ndarray):
+        """
+        Writes the samples starting at 'start'. Writes that
+        do not continue the held samples drop the history.
+        """
+        n = values.shape[0]
+        if start != self.end:
+            self.buffer[:] = 0
+            self.begin = start
+        offset = start % self.capacity
+        first = min(n, self.capacity - offset)
+        self.buffer[offset:offset + first] = values[:first]
+        self.buffer[:n - first] = values[first:]
+        self.end = start + n
+        self.begin = max(self.begin, self.end - self.capacity)
+
+    def read(self, start : int, n : int) -> np.ndarray:
+        """
+        Returns a copy of the samples [start, start + n)
+        """
+        positions = np.arange(start, start + n)
+        values = np.take(self.buffer, positions, mode="wrap")
+        values[(positions < self.begin) | (positions >= self.end)] = 0
+        return values
+
+    def interpolate(self, positions : np.ndarray) -> np.ndarray:
+        """
+        Reads at fractional sample positions with
+        linear interpolation
+        """
+        lower = np.floor(positions)
+        x = positions - lower
+        lower = lower.astype(np.int64)
+        values = np.take(self.buffer, lower, mode="wrap") * (1 - x) \
+               + np.take(self.buffer, lower + 1, mode="wrap") * x
+        # The upper sample is only read with a fraction
+        values[(lower < self.begin) | (lower >= self.end)
+               | ((lower + 1 >= self.end) & (x > 0))] = 0
+        return values
+
+class delay_line(funk):
+    """
+    Records the output of its source into a history that
+    is kept across blocks, such that delayed copies of the
+    source are read from the history instead of evaluating
+    the source again. Evaluating the delay line itself
+    gives the undelayed source.
+
+    Note: The history is only used for the blocks rendered
+    by a player. For other times the taps evaluate the
+    source at the delayed times.
+    """
+    def __init__(self,
+                 source : funk,
+                 max_delay : float = DELAY_LINE_MAX_DELAY):
+        self.source : funk = source
+        self.max_delay : float = max_delay
+        self.history = _history(ceil(max_delay * SAMPLERATE) + BLOCK_SIZE)
+
+    def _references(self) -> List[funk]:
+        return [self.source]
+
+    @property
+    def repr(self) -> str:
+        if self.max_delay != DELAY_LINE_MAX_DELAY:
+            return (f"delay_line({_reference(self.source)}, "
+                    f"max_delay={self.max_delay})")
+        return f"delay_line({_reference(self.source)})"
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        values = self.source(t)
+        start = block_start(t)
+        if start is not None and not self.history.holds(start,
+                                                        start + len(t)):
+            self.history.write(start, np.broadcast_to(values, t.shape))
+        return values
+
+    def record(self, t : np.ndarray) -> int | None:
+        """
+        Makes sure the block t is recorded and returns
+        its start sample, or None if t is no block
+        """
+        start = block_start(t)
+        if start is not None:
+            self(t)
+        return start
+
+    def tap(self,
+            delay : float | funk,
+            gain : float = 1.0) -> tap:
+        """
+        Returns a funk that reads the source delayed by
+        'delay' seconds, which can also be a funk for
+        modulated delays
+        """
+        return tap(self, delay, gain)
+
+class tap(funk):
+    """
+    Delayed and scaled read from a delay line
+    """
+    def __init__(self,
+                 line : delay_line,
+                 delay : float | funk,
+                 gain : float = 1.0):
+        if not isinstance(delay, funk) and not 0 <= delay <= line.max_delay:
+            raise ValueError(f"The delay must be between 0 and "
+                             f"{line.max_delay} seconds")
+        self.line : delay_line = line
+        self.delay : float | funk = delay
+        self.gain : float = gain
+
+    def _references(self) -> List[funk]:
+        return [self.line] + ([self.delay] if isinstance(self.delay, funk)
+                              else [])
+
+    @property
+    def repr(self) -> str:
+        line = _reference(self.line)
+        delay = _reference(self.delay) if isinstance(self.delay, funk) \
+                else self.delay
+        if self.gain != 1.0:
+            return f"{line}.tap({delay}, gain={self.gain})"
+        return f"{line}.tap({delay})"
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        start = self.line.record(t) if isinstance(t, np.ndarray) else None
+        if isinstance(self.delay, funk):
+            delay = np.clip(self.delay(t), 0, self.line.max_delay)
+        else:
+            delay = self.delay
+        if start is None:
+            return self.gain * self.line.source(t - delay)
+        if isinstance(self.delay, funk):
+            positions = np.arange(start, start + len(t)) \
+                      - delay * SAMPLERATE
+            values = self.line.history.interpolate(positions)
+        else:
+            values = self.line.history.read(
+                start - round(delay * SAMPLERATE), len(t)
+            )
+        values *= self.gain
+        return values
+
+class feedback_delay(funk):
+    """
+    Feedback delay y(t) = x(t) + gain * y(t - delay),
+    which keeps its own output in a history. Delays
+    shorter than a block are computed in chunks of the
+    delay length.
+
+    Note: Outside of the blocks rendered by a player
+    only the source is passed through.
+    """
+    def __init__(self,
+                 source : funk,
+                 delay : float,
+                 gain : float = 0.5):
+        if delay <= 0:
+            raise ValueError("The delay of a feedback delay "
+                             "must be positive")
+        self.source : funk = source
+        self.delay : float = delay
+        self.gain : float = gain
+        self._samples : int = max(1, round(delay * SAMPLERATE))
+        self.history = _history(self._samples + BLOCK_SIZE)
+
+    def _references(self) -> List[funk]:
+        return [self.source]
+
+    @property
+    def repr(self) -> str:
+        return (f"feedback_delay({_reference(self.source)}, {self.delay}, "
+                f"gain={self.gain})")
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        start = block_start(t)
+        if start is None:
+            return self.source(t)
+        n = len(t)
+        if self.history.holds(start, start + n):
+            return self.history.read(start, n)
+        x = self.source(t)
+        y = np.array(np.broadcast_to(x, (n,)), dtype=float)
+        for i in range(0, n, self._samples):
+            m = min(self._samples, n - i)
+            y[i:i + m] += self.gain * self.history.read(
+                start + i - self._samples, m
+            )
+            self.history.write(start + i, y[i:i + m])
+        return y
+
+def _fast_length(n : int) -> int:
+    """
+    Returns the smallest length >= n that has no prime
+    factors other than 2, 3 and 5, for which FFTs are fast
+    """
+    best = 1 << max(0, (n - 1).bit_length())
+    power_of_5 = 1
+    while power_of_5 < best:
+        power_of_3 = power_of_5
+        while power_of_3 < best:
+            length = power_of_3
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power_of_3 *= 3
+        power_of_5 *= 5
+    return best
+
+def _read_impulse_response(path : str) -> np.ndarray:
+    """
+    Reads a mono impulse response from a .wav or .npy
+    file, multiple channels are averaged
+    """
+    if path.endswith(".npy"):
+        return np.asarray(np.load(path), dtype=float)
+    with wave.open(path, "rb") as file:
+        if file.getframerate() != SAMPLERATE:
+            raise ValueError(f"The impulse response has a sample rate of "
+                             f"{file.getframerate()} instead of {SAMPLERATE}")
+        width = file.getsampwidth()
+        if width not in (2, 4):
+            raise ValueError("Only int16 and int32 WAV files are supported")
+        dtype = np.dtype(f"<i{width}")
+        samples = np.frombuffer(file.readframes(file.getnframes()),
+                                dtype=dtype)
+        samples = samples.reshape(-1, file.getnchannels()).mean(axis=1)
+    return samples / np.iinfo(dtype).max
+
+class convolution(funk):
+    """
+    Convolves its source with an impulse response using
+    uniformly partitioned FFT overlap-add.
+
+    The impulse response is split into partitions of
+    'partition' samples, whose spectra are computed once.
+    Every partition of the source is transformed once and
+    kept in a frequency domain delay line across blocks,
+    such that the output of a partition is one complex
+    multiply-add per partition of the impulse response
+    and one inverse FFT. The source is evaluated once per
+    block, so the convolution shares its evaluation with
+    the dry signal and only holds one block of it.
+
+    In an offline rendering by 'player.render' sources
+    with a known period, which are pure functions of 
+    time, are evaluated over the whole rendered span 
+    ahead of the blocks and convolved with a single FFT.
+    The blocks of the span read the source from that
+    evaluation, such that the dry signal does not 
+    evaluate it again.
+
+    Note: The convolution is only defined for the blocks
+    rendered by a player and silent for other times.
+
+    Args:
+        source (funk):        signal to convolve
+        impulse_response:     samples at SAMPLERATE or the
+                              path of a .wav or .npy file
+        partition (int):      partition size in samples,
+                              must divide the block size
+    """
+    def __init__(self,
+                 source : funk,
+                 impulse_response : np.ndarray | Sequence[float] | str,
+                 partition : int = BLOCK_SIZE):
+        self.source : funk = source
+        self.path : str | None = None
+        if isinstance(impulse_response, str):
+            self.path = impulse_response
+            impulse_response = _read_impulse_response(impulse_response)
+        self.impulse_response : np.ndarray = np.asarray(impulse_response,
+                                                        dtype=float)
+        if self.impulse_response.ndim != 1 or not self.impulse_response.size:
+            raise ValueError("The impulse response must be a "
+                             "non-empty one dimensional array")
+        if partition < 1 or BLOCK_SIZE % partition:
+            raise ValueError(f"The partition size must be a positive "
+                             f"divisor of the block size {BLOCK_SIZE}")
+        self.partition : int = partition
+        partitions = -(-self.impulse_response.size // partition)
+        padded = np.zeros(partitions * partition)
+        padded[:self.impulse_response.size] = self.impulse_response
+        self.spectra : np.ndarray = np.fft.rfft(
+            padded.reshape(partitions, partition), 2 * partition
+        )
+        self.reset()
+
+    def reset(self):
+        """
+        Drops the state kept across blocks
+        """
+        self._delay_line : np.ndarray = np.zeros_like(self.spectra)
+        self._position : int = 0
+        self._tail : np.ndarray = np.zeros(self.partition)
+        # Start sample of the next block that continues
+        # the state
+        self._next : int | None = None
+        self._last : Tuple[int, np.ndarray] | None = None
+
+    def _references(self) -> List[funk]:
+        return [self.source]
+
+    @property
+    def repr(self) -> str:
+        arrays = _array_store()
+        if self.path is not None:
+            impulse_response = f"\"{self.path}\""
+        elif arrays is not None:
+            key = f"impulse_response{len(arrays)}"
+            arrays[key] = self.impulse_response
+            impulse_response = f"__arrays__[\"{key}\"]"
+        else:
+            impulse_response = f"np.array({self.impulse_response.tolist()!r})"
+        if self.partition != BLOCK_SIZE:
+            return (f"convolution({_reference(self.source)}, {impulse_response}, "
+                    f"partition={self.partition})")
+        return f"convolution({_reference(self.source)}, {impulse_response})"
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        start = block_start(t)
+        if start is None:
+            return np.zeros_like(t, dtype=float)
+        n = len(t)
+        span = render_span()
+        if span is not None and span.start <= start < span.stop \
+           and n == BLOCK_SIZE and self.source.period is not None:
+            return self._render_offline(span, start)
+        if self._last is not None and self._last[0] == start \
+           and self._last[1].shape[0] == n:
+            return self._last[1].copy()
+        y = self._render_partitioned(start, np.broadcast_to(
+            self.source(t), t.shape
+        ))
+        self._last = (start, y)
+        return y.copy()
+
+    def _render_partitioned(self, start : int, x : np.ndarray) -> np.ndarray:
+        """
+        Convolves the block x starting at sample 'start'
+        partition by partition
+        """
+        P = self.partition
+        if x.shape[0] % P:
+            raise ValueError(f"The block size {x.shape[0]} is no "
+                             f"multiple of the partition size {P}")
+        if start != self._next:
+            self.reset()
+        K = self.spectra.shape[0]
+        H, X = self.spectra, self._delay_line
+        y = np.empty(x.shape[0])
+        for i in range(0, x.shape[0], P):
+            p = self._position = (self._position + 1) % K
+            X[p] = np.fft.rfft(x[i:i + P], 2 * P)
+            # Spectrum k partitions ago is in row (p - k) % K
+            spectrum = np.einsum("kf,kf->f", H[p::-1], X[:p + 1]) \
+                     + np.einsum("kf,kf->f", H[K - 1:p:-1], X[p + 1:])
+            output = np.fft.irfft(spectrum, 2 * P)
+            y[i:i + P] = output[:P] + self._tail
+            self._tail = output[P:]
+        self._next = start + x.shape[0]
+        return y
+
+    def _render_offline(self, span : _span, start : int) -> np.ndarray:
+        """
+        Convolves the whole span of an offline rendering
+        at once and returns the block starting at 'start'.
+        The evaluations of the source and the convolution
+        over the span are added to its values, which the
+        following blocks are sliced from.
+        """
+        first = span.start
+        x = span.values.get(self.source)
+        if x is None:
+            blocks = -(-(span.stop - first) // BLOCK_SIZE)
+            x = np.empty(blocks * BLOCK_SIZE, dtype=evaluation_dtype())
+            block = np.arange(BLOCK_SIZE, dtype=np.int64)
+            # The blocks match the ones of the player, such
+            # that they share the cached evaluations
+            for i in range(blocks):
+                s = first + i * BLOCK_SIZE
+                t = (s + block) / SAMPLERATE
+                with block_cache.block(t, s, x.dtype):
+                    x[i * BLOCK_SIZE:(i + 1) * BLOCK_SIZE] = self.source(t)
+            # Slices are handed out as block values,
+            # which must not be modified
+            x.flags.writeable = False
+            span.values[self.source] = x
+        length = _fast_length(x.shape[0] + self.impulse_response.size - 1)
+        y = np.fft.irfft(np.fft.rfft(x, length)
+                         * np.fft.rfft(self.impulse_response, length),
+                         length)[:x.shape[0]]
+        y.flags.writeable = False
+        span.values[self] = y
+        offset = start - first
+        return y[offset:offset + BLOCK_SIZE]
@@ -69,16 +69,22 @@ class epiano(funk):
         if freq != E_PIANO_FREQ:
             active_args.append(f"freq={freq}")
         if base_signal != E_PIANO_BASE_SIGNAL:
-            active_args.append(f"base_signal={base_signal}")
+            active_args.append(f"base_signal={base_signal.__name__}")
         if harmonics_decay != E_PIANO_HARMONICS_DECAY:
             active_args.append(f"harmonics_decay={harmonics_decay}")
         if harmonics != E_PIANO_HARMONICS:
             active_args.append(f"harmonics={harmonics}")
         self._repr = f"epiano({', '.join(active_args)})"
 
-        self.harmonics = [harmonics_decay**i * base_signal(i * freq) for i 
-                          in range(1, harmonics + 1)]
-        
+        self.harmonics = harmonic_bank(
+            freq, 
+            [harmonics_decay**i for i in range(1, harmonics + 1)],
+            base_signal
+        )
+
+    @property
+    def period(self):
+        return self.harmonics.period
 
     def f(self, t):
-        return np.sum([f(t) for f in self.harmonics], axis=0)
+        return self.harmonics(t)
@@ -1,8 +1,12 @@
 from __future__ import annotations
 import numpy as np
-from .base import funk, daw_object
-from .utils import _get_global_daw_objects
-import curses as c
+import operator
+from .base import funk, daw_object, block_start, evaluation_dtype, \
+                  BLOCK_SIZE, SAMPLERATE
+from .utils import _registry, _reference, _array_store, _fingerprint
+from collections import OrderedDict
+from math import floor, ceil
+import threading
 from typing import *
 
 BPM = 120
@@ -66,30 +70,99 @@ def frequency(st : int) -> float:
 
 class Note:
     """
-    Class representing a note
+    Class representing a note. The semi tone
+    index is parsed once and cached, the note
+    string is only built when it is needed.
     """
+    __slots__ = ("_note_string", "_st", "_start", "_duration", "_velocity")
+    # Number of edits of any note or sequence, which
+    # tells the note funks that their notes might 
+    # have changed
+    _edits : int = 0
+
     def __init__(self, 
                  note_string : str ="C4",
                  start : float = 0,
                  duration : float = 1,
                  velocity : float = 1,
                  ):
-        self.note_string : str = note_string
-        self.start : float = start
-        self.duration : float = duration
-        self.velocity : float = velocity
+        self._st : int = semitone(note_string)
+        self._note_string : str | None = note_string
+        self._start : float = start
+        self._duration : float = duration
+        self._velocity : float = velocity
+
+    @classmethod
+    def _make(cls,
+              st : int,
+              start : float,
+              duration : float,
+              velocity : float,
+              note_string : str | None = None) -> Note:
+        """
+        Builds a note from its semi tone index 
+        without any string parsing
+        """
+        note = cls.__new__(cls)
+        note._note_string = note_string
+        note._st = st
+        note._start = start
+        note._duration = duration
+        note._velocity = velocity
+        return note
+
+    @property
+    def note_string(self) -> str:
+        if self._note_string is None:
+            self._note_string = note_string(self._st)
+        return self._note_string
+
+    @note_string.setter
+    def note_string(self, note_string : str):
+        self._st = semitone(note_string)
+        self._note_string = note_string
+        Note._edits += 1
 
     @property
     def st(self) -> int:
-        return semitone(self.note_string)
+        return self._st
 
     @st.setter
     def st(self, st : int):
-        self.note_string = note_string(st)
+        self._st = st
+        self._note_string = None
+        Note._edits += 1
+
+    @property
+    def start(self) -> float:
+        return self._start
+
+    @start.setter
+    def start(self, start : float):
+        self._start = start
+        Note._edits += 1
+
+    @property
+    def duration(self) -> float:
+        return self._duration
+
+    @duration.setter
+    def duration(self, duration : float):
+        self._duration = duration
+        Note._edits += 1
+
+    @property
+    def velocity(self) -> float:
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, velocity : float):
+        self._velocity = velocity
+        Note._edits += 1
 
     @property
     def frequency(self) -> float:
-        return frequency(self.st)
+        return frequency(self._st)
 
     def __add__(self, other : int) -> Note:
         """
@@ -101,14 +174,10 @@ class Note:
                 "One can only add semiton offset to notes"
             )
         else:
-            st = self.st + other
-            return Note(
-                note_string=note_string(st),
-                start=self.start,
-                duration=self.duration,
-                velocity=self.velocity,
-            )
-
+            return Note._make(self._st + other,
+                              self.start,
+                              self.duration,
+                              self.velocity)
 
     def __sub__(self, other : int) -> Note:
         """
@@ -120,13 +189,10 @@ class Note:
                 "One can only subtract semiton offset from notes"
             )
         else:
-            st = self.st - other
-            return Note(
-                note_string=note_string(st),
-                start=self.start,
-                duration=self.duration,
-                velocity=self.velocity,
-            )
+            return Note._make(self._st - other,
+                              self.start,
+                              self.duration,
+                              self.velocity)
 
     def __mul__(self, other : float) -> Note:
         """
@@ -138,12 +204,11 @@ class Note:
                 "Note starts can only be offset by float values"
             )
         else:
-            return Note(
-                note_string=self.note_string,
-                start=self.start + other,
-                duration=self.duration,
-                velocity=self.velocity,
-            )
+            return Note._make(self._st,
+                              self.start + other,
+                              self.duration,
+                              self.velocity,
+                              self._note_string)
     
     def __truediv__(self, other : float) -> Note:
         """
@@ -155,12 +220,11 @@ class Note:
                 "Note starts can only be ofset by float values"
             )
         else:
-            return Note(
-                note_string=self.note_string,
-                start=self.start - other,
-                duration=self.duration,
-                velocity=self.velocity,
-            )
+            return Note._make(self._st,
+                              self.start - other,
+                              self.duration,
+                              self.velocity,
+                              self._note_string)
 
 
     def __lt__(self, other : Note) -> bool:
@@ -191,6 +255,229 @@ class Note:
         return f"Note(\"{self.note_string}\", {self.start}, {self.duration}, {self.velocity})"
 
 
+def _counted(method : Callable) -> Callable:
+    """
+    Wraps a method of list, such that every call
+    counts as note edit
+    """
+    def counted(self, *args, **kwargs):
+        Note._edits += 1
+        return method(self, *args, **kwargs)
+    counted.__name__ = method.__name__
+    return counted
+
+class _note_list(list):
+    """
+    List of notes that counts its changes
+    as note edits
+    """
+    __setitem__ = _counted(list.__setitem__)
+    __delitem__ = _counted(list.__delitem__)
+    __iadd__ = _counted(list.__iadd__)
+    __imul__ = _counted(list.__imul__)
+    append = _counted(list.append)
+    extend = _counted(list.extend)
+    insert = _counted(list.insert)
+    pop = _counted(list.pop)
+    remove = _counted(list.remove)
+    clear = _counted(list.clear)
+    sort = _counted(list.sort)
+    reverse = _counted(list.reverse)
+
+class NoteArray:
+    """
+    Struct of arrays of notes with an int16 semi tone,
+    a start, a duration and a velocity column. Notes 
+    are filtered, shifted and transposed with one 
+    vectorized operation per column.
+    """
+    def __init__(self,
+                 st : Sequence[int] | np.ndarray = (),
+                 start : Sequence[float] | np.ndarray = (),
+                 duration : Sequence[float] | np.ndarray = (),
+                 velocity : Sequence[float] | np.ndarray = ()):
+        self.st : np.ndarray = np.asarray(st, dtype=np.int16)
+        self.start : np.ndarray = np.asarray(start, dtype=float)
+        self.duration : np.ndarray = np.asarray(duration, dtype=float)
+        self.velocity : np.ndarray = np.asarray(velocity, dtype=float)
+        if not (self.st.shape == self.start.shape 
+                == self.duration.shape == self.velocity.shape):
+            raise ValueError("All columns of a note array must "
+                             "have the same length")
+
+    @classmethod
+    def from_notes(cls, notes : Iterable[Note]) -> NoteArray:
+        """
+        Packs notes into a note array
+        """
+        if isinstance(notes, NoteArray):
+            return notes
+        notes = list(notes)
+        return cls([n.st for n in notes],
+                   [n.start for n in notes],
+                   [n.duration for n in notes],
+                   [n.velocity for n in notes])
+
+    @classmethod
+    def concatenate(cls, arrays : Iterable[NoteArray]) -> NoteArray:
+        """
+        Joins note arrays
+        """
+        arrays = list(arrays)
+        if not arrays:
+            return cls()
+        return cls(*[np.concatenate([getattr(a, c) for a in arrays])
+                     for c in ("st", "start", "duration", "velocity")])
+
+    @property
+    def end(self) -> np.ndarray:
+        return self.start + self.duration
+
+    @property
+    def frequency(self) -> np.ndarray:
+        return 440 * 2 ** ((self.st - 9) / 12)
+
+    def to_notes(self) -> List[Note]:
+        """
+        Unpacks the note array into notes
+        """
+        return [Note._make(int(st), float(start), float(duration), 
+                           float(velocity))
+                for st, start, duration, velocity 
+                in zip(self.st, self.start, self.duration, self.velocity)]
+
+    def transpose(self, semitones : int | np.ndarray) -> NoteArray:
+        """
+        Shifts all notes by 'semitones'
+        """
+        return NoteArray(self.st + semitones, self.start,
+                         self.duration, self.velocity)
+
+    def shift(self, beats : float | np.ndarray) -> NoteArray:
+        """
+        Offsets the starts of all notes by 'beats'
+        """
+        return NoteArray(self.st, self.start + beats,
+                         self.duration, self.velocity)
+
+    def between(
+        self, 
+        start : float, 
+        stop : float, 
+        tail : float = 0.0
+    ) -> NoteArray:
+        """
+        Returns the notes that start before 'stop' and
+        end (plus 'tail') after 'start'
+        """
+        return self[(self.start <= stop) 
+                    & (self.start + self.duration + tail >= start)]
+
+    def sorted(self) -> NoteArray:
+        """
+        Returns the notes sorted by their start
+        """
+        return self[np.argsort(self.start, kind="stable")]
+
+    def __add__(self, other : int) -> NoteArray:
+        """
+        Shift all notes up by 'other' amount of
+        semi tones
+        """
+        return self.transpose(other)
+
+    def __sub__(self, other : int) -> NoteArray:
+        """
+        Shift all notes down by 'other' amount of
+        semi tones
+        """
+        return self.transpose(-other)
+
+    def __mul__(self, other : float) -> NoteArray:
+        """
+        Offsets all note starts in positive direction 
+        by 'other' amount of beats
+        """
+        return self.shift(other)
+
+    def __truediv__(self, other : float) -> NoteArray:
+        """
+        Offsets all note starts in negative direction 
+        by 'other' amount of beats
+        """
+        return self.shift(-other)
+
+    def __len__(self) -> int:
+        return self.st.shape[0]
+
+    def __getitem__(self, idx : int | slice | np.ndarray) -> Note | NoteArray:
+        """
+        Returns a single note for an integer index
+        and a note array otherwise
+        """
+        if isinstance(idx, (int, np.integer)):
+            return Note._make(int(self.st[idx]), 
+                              float(self.start[idx]),
+                              float(self.duration[idx]), 
+                              float(self.velocity[idx]))
+        return NoteArray(self.st[idx], self.start[idx],
+                         self.duration[idx], self.velocity[idx])
+
+    def __iter__(self) -> Iterator[Note]:
+        return iter(self.to_notes())
+
+    def __repr__(self) -> str:
+        return (f"NoteArray({self.st.tolist()}, {self.start.tolist()}, "
+                f"{self.duration.tolist()}, {self.velocity.tolist()})")
+
+def _pack_notes(notes : List[Note]) -> Dict[str, np.ndarray]:
+    """
+    Packs notes into arrays without losing anything
+    of their script form. Besides the columns, the
+    spellings that differ from the canonical ones
+    and the fields that were ints are kept.
+    """
+    array = NoteArray.from_notes(notes)
+    packed = {"st": array.st, "start": array.start,
+              "duration": array.duration, "velocity": array.velocity}
+    spelled = [i for i, n in enumerate(notes)
+               if n._note_string is not None
+               and n._note_string != note_string(n.st)]
+    if spelled:
+        packed["spelled"] = np.array(spelled, dtype=np.int64)
+        packed["spelling"] = np.array([notes[i]._note_string 
+                                       for i in spelled])
+    ints = np.array([(type(n.start) is int) 
+                     | (type(n.duration) is int) << 1
+                     | (type(n.velocity) is int) << 2 
+                     for n in notes], dtype=np.uint8)
+    if ints.any():
+        packed["ints"] = ints
+    return packed
+
+def _unpack_notes(arrays : Mapping[str, np.ndarray], key : str) -> List[Note]:
+    """
+    Unpacks the notes packed into the arrays 'key_*'
+    """
+    notes = NoteArray(arrays[f"{key}_st"], arrays[f"{key}_start"],
+                      arrays[f"{key}_duration"], 
+                      arrays[f"{key}_velocity"]).to_notes()
+    if f"{key}_ints" in arrays:
+        ints = arrays[f"{key}_ints"]
+        for i in np.flatnonzero(ints):
+            note = notes[i]
+            if ints[i] & 1:
+                note.start = int(note.start)
+            if ints[i] & 2:
+                note.duration = int(note.duration)
+            if ints[i] & 4:
+                note.velocity = int(note.velocity)
+    if f"{key}_spelled" in arrays:
+        for i, spelling in zip(arrays[f"{key}_spelled"], 
+                               arrays[f"{key}_spelling"]):
+            notes[i]._note_string = str(spelling)
+    return notes
+
 class NoteIndicator(funk):
     """
     Curve that describes attack and decay of a note
@@ -221,10 +508,233 @@ class NoteIndicator(funk):
         )
         return r
 
+class NoteIndex:
+    """
+    Index over notes sorted by their start, 
+    which finds the notes sounding in a time 
+    window in O(log n + k)
+    """
+    def __init__(self, notes : Iterable[Note] | NoteArray):
+        self.notes : NoteArray = NoteArray.from_notes(notes).sorted()
+        self.ends : np.ndarray = self.notes.end
+        # Longest note, which bounds how far before a
+        # window a sounding note can start
+        self.max_duration : float = float(np.max(self.notes.duration)) \
+                                    if len(self.notes) else 0.0
+        # End of the note that ends last
+        self.end : float = float(np.max(self.ends)) \
+                           if len(self.notes) else 0.0
+
+    def between(
+        self, 
+        start : float, 
+        stop : float, 
+        tail : float = 0.0
+    ) -> NoteArray:
+        """
+        Returns the notes that start before 'stop' and
+        end (plus 'tail') after 'start'. All times are
+        in beats.
+        """
+        lo = np.searchsorted(self.notes.start, 
+                             start - tail - self.max_duration, 
+                             "left")
+        hi = np.searchsorted(self.notes.start, stop, "right")
+        return self.notes[
+            np.flatnonzero(self.ends[lo:hi] + tail >= start) + lo
+        ]
+
+    def __len__(self) -> int:
+        return len(self.notes)
+
+def _same_notes(
+    notes : Sequence[Note] | NoteArray,
+    other : Sequence[Note] | NoteArray | None
+) -> bool:
+    """
+    Whether 'notes' holds the same note objects 
+    as 'other'
+    """
+    if isinstance(notes, NoteArray) or isinstance(other, NoteArray):
+        return notes is other
+    return other is not None and len(notes) == len(other) \
+           and all(map(operator.is_, notes, other))
+
+ADSR_ATTACK = 0.01
+ADSR_DECAY = 0.0
+ADSR_SUSTAIN = 1.0
+ADSR_RELEASE = 0.1
+# Largest exponent of the separated exponential 
+# curves before falling back to plain exponentials
+MAX_CURVE_EXPONENT = 600
+
+class ADSR:
+    """
+    Attack, decay, sustain, release envelope that is 
+    evaluated for many notes at once.
+
+    While a note is held the level rises as 
+    1 - exp(-t / attack) and decays exponentially 
+    towards the sustain level with time constant 
+    'decay'. After its end the level reached at the 
+    end falls off with time constant 'release'.
+    """
+    def __init__(self,
+                 attack : float = ADSR_ATTACK,
+                 decay : float = ADSR_DECAY,
+                 sustain : float = ADSR_SUSTAIN,
+                 release : float = ADSR_RELEASE):
+        self.attack : float = attack
+        self.decay : float = decay
+        self.sustain : float = sustain
+        self.release : float = release
+        # Curves exp(-i / SAMPLERATE / tau) over a block,
+        # keyed on tau
+        self._tables : Dict[float, np.ndarray] = {}
+
+    def _table(self, n : int, tau : float) -> np.ndarray:
+        """
+        Returns the decay curve of time constant 'tau' 
+        over n samples. Only the curves over a whole 
+        block are kept, such that there is at most one
+        per time constant.
+        """
+        if n != BLOCK_SIZE:
+            return np.exp(-np.arange(n) / SAMPLERATE / tau)
+        if tau not in self._tables:
+            self._tables[tau] = np.exp(-np.arange(n) / SAMPLERATE / tau)
+        return self._tables[tau]
+
+    def _curve(
+        self, 
+        tau : float, 
+        offset : np.ndarray, 
+        t : np.ndarray, 
+        uniform : bool
+    ) -> np.ndarray:
+        """
+        Returns exp(-(t - offset) / tau) for every offset
+        as 2-D array. For uniformly sampled blocks this is
+        the outer product of a per note factor and a 
+        precomputed table, such that no exponential has
+        to be evaluated per sample.
+        """
+        if tau <= 0:
+            return np.zeros((offset.shape[0], t.shape[0]))
+        # Samples before the offset are masked by the caller,
+        # bounding the exponent only keeps them finite
+        bound = (t[-1] - t[0]) / tau + 1
+        if uniform and bound < MAX_CURVE_EXPONENT:
+            factor = np.exp(np.minimum((offset - t[0]) / tau, bound))
+            return np.multiply.outer(factor, self._table(t.shape[0], tau))
+        exponent = np.subtract.outer(offset, t) / tau
+        return np.exp(np.minimum(exponent, bound, out=exponent), 
+                      out=exponent)
+
+    def tail(self, threshold : float) -> float:
+        """
+        Time in seconds after the end of a note until 
+        its level dropped below 'threshold'
+        """
+        if self.release <= 0 or threshold <= 0:
+            return 0.0 if self.release <= 0 else float("inf")
+        return self.release * max(0.0, np.log(1 / threshold))
+
+    def level_at(
+        self, 
+        t : float, 
+        start : np.ndarray, 
+        end : np.ndarray
+    ) -> np.ndarray:
+        """
+        Levels of the notes held from start to end
+        at the single time t
+        """
+        level = self.level(np.clip(t - start, 0, end - start))
+        released = t > end
+        if self.release > 0:
+            level[released] *= np.exp(-(t - end[released]) / self.release)
+        else:
+            level[released] = 0
+        level[t < start] = 0
+        return level
+
+    def level(self, dt : np.ndarray | float) -> np.ndarray | float:
+        """
+        Level of a note that is held for dt seconds
+        """
+        dt = np.asarray(dt, dtype=float)
+        level = 1 - np.exp(-dt / self.attack) if self.attack > 0 \
+                else np.ones_like(dt)
+        if self.sustain != 1:
+            if self.decay > 0:
+                level *= self.sustain + (1 - self.sustain) \
+                         * np.exp(-dt / self.decay)
+            else:
+                level *= self.sustain
+        return level
+
+    def __call__(
+        self,
+        t : np.ndarray,
+        start : np.ndarray,
+        end : np.ndarray,
+        uniform : bool = False
+    ) -> np.ndarray:
+        """
+        Evaluates the envelopes of the notes that are 
+        held from start to end (in seconds) at the times
+        t in a single 2-D pass
+
+        Args:
+            t (np.ndarray):     times to evaluate at
+            start (np.ndarray): starts of the notes
+            end (np.ndarray):   ends of the notes
+            uniform (bool):     whether t is spaced by
+                                exactly one sample
+
+        Returns:
+            Array of shape (notes, times)
+        """
+        envelope = 1 - self._curve(self.attack, start, t, uniform)
+        if self.sustain != 1:
+            if self.decay > 0:
+                decay = self._curve(self.decay, start, t, uniform)
+                envelope *= self.sustain + (1 - self.sustain) * decay
+            else:
+                envelope *= self.sustain
+        after = np.greater.outer(t, end).T
+        if after.any():
+            release = self._curve(self.release, end, t, uniform)
+            release *= self.level(end - start)[:, None]
+            np.copyto(envelope, release, where=after)
+        envelope[np.less.outer(t, start).T] = 0
+        return envelope
+
+    def __repr__(self) -> str:
+        active_args = []
+        if self.attack != ADSR_ATTACK:
+            active_args.append(f"attack={self.attack}")
+        if self.decay != ADSR_DECAY:
+            active_args.append(f"decay={self.decay}")
+        if self.sustain != ADSR_SUSTAIN:
+            active_args.append(f"sustain={self.sustain}")
+        if self.release != ADSR_RELEASE:
+            active_args.append(f"release={self.release}")
+        return f"ADSR({', '.join(active_args)})"
+
 class nfunk(daw_object):
     """
     FUNKy note function that returns a list of notes
     """
+    # Index over the notes for windowed queries and 
+    # the version it was built for. Without a version
+    # the notes it was built from and the number of
+    # note edits at that time.
+    _index : NoteIndex | None = None
+    _index_version : Any = None
+    _index_notes : Sequence[Note] | NoteArray | None = None
+    _index_edits : int = -1
     def __init__( 
         self, 
         f : Union[
@@ -249,46 +759,205 @@ class nfunk(daw_object):
         """
         return self._repr
 
-    def __repr__(self):
+    def __call__(self) -> List[Note]:
+        return self.f()
+
+    @property
+    def version(self) -> Any:
         """
-        Returns the python code that Generates
-        the object
+        Value that changes whenever the returned notes
+        change. None means that this is unknown and the
+        notes have to be fetched every time.
         """
-        name_of_globals = _get_global_daw_objects()
-        if self in name_of_globals:
-            return f"{name_of_globals[self]} = {self.repr}"
-        return self.repr
+        return None
 
-    def __call__(self) -> List[Note]:
-        return self.f()
+    def notes_between(
+        self, 
+        start : float, 
+        stop : float, 
+        tail : float = 0.0
+    ) -> NoteArray:
+        """
+        Returns the notes that start before 'stop' and
+        end (plus 'tail') after 'start'. All times are
+        in beats.
+
+        The default implementation indexes all notes and
+        rebuilds the index only if the version changed.
+        Without a version the index is kept as long as 
+        the same note objects are returned and no note
+        was edited.
+        """
+        version = self.version
+        if version is not None:
+            if self._index is None or version != self._index_version:
+                self._index = NoteIndex(self())
+                self._index_version = version
+            return self._index.between(start, stop, tail)
+        notes = self()
+        if not isinstance(notes, (Sequence, NoteArray)):
+            notes = list(notes)
+        if self._index is None or Note._edits != self._index_edits \
+           or not _same_notes(notes, self._index_notes):
+            self._index = NoteIndex(notes)
+            self._index_edits = Note._edits
+            # A copy, the returned list might be changed in place
+            self._index_notes = notes if isinstance(notes, NoteArray) \
+                                else list(notes)
+        return self._index.between(start, stop, tail)
+
+# Level below which released voices are culled
+CULL_THRESHOLD = 1e-3
+STEALING_POLICIES = ("oldest", "quietest", "release")
+# Memory the rendered voices of a Pitcher may take
+VOICE_CACHE_BYTES = 32 * 2**20
+
+class _voice_cache:
+    """
+    Least recently used store of rendered voices within
+    a byte budget. The voices belong to one input signal
+    and envelope and are dropped once the code of either
+    changes.
+    """
+    def __init__(self, budget : int):
+        self.budget : int = budget
+        self.voices : OrderedDict[Tuple, np.ndarray] = OrderedDict()
+        self.bytes : int = 0
+        # Signal and envelope the voices were rendered with
+        self.stamp : Tuple | None = None
+        self.lock = threading.Lock()
+
+    def validate(self, stamp : Tuple | None, budget : int | None = None):
+        """
+        Drops all voices if they were rendered with
+        another signal or envelope and evicts voices
+        until they fit the budget
+        """
+        with self.lock:
+            if stamp != self.stamp:
+                self.voices.clear()
+                self.bytes = 0
+                self.stamp = stamp
+            if budget is not None:
+                self.budget = budget
+            self._evict()
+
+    def _evict(self):
+        """
+        Evicts the least recently used voices until
+        the store fits the budget
+        """
+        while self.bytes > self.budget:
+            _, evicted = self.voices.popitem(last=False)
+            self.bytes -= evicted.nbytes
+
+    def get(self, key : Tuple) -> np.ndarray | None:
+        """
+        Returns the voice of key, if it is stored
+        """
+        with self.lock:
+            voice = self.voices.get(key)
+            if voice is not None:
+                self.voices.move_to_end(key)
+            return voice
+
+    def put(self, key : Tuple, voice : np.ndarray):
+        """
+        Stores the voice and evicts the least recently
+        used ones until the store fits the budget
+        """
+        if voice.nbytes > self.budget:
+            return
+        with self.lock:
+            self.voices[key] = voice
+            self.bytes += voice.nbytes
+            self._evict()
 
 class Pitcher(funk):
     """
     Pitches an input signal according to its note list
     """
-    def __init__(self):
+    _needs_name = True
+
+    def __init__(self, 
+                 envelope : ADSR | None = None,
+                 max_voices : int | None = None,
+                 stealing : str = "oldest",
+                 threshold : float = CULL_THRESHOLD,
+                 voice_cache : int = VOICE_CACHE_BYTES):
+        """
+        Every voice is a note of the input signal that
+        starts at the beginning of the note. Voices of 
+        signals that are pure functions of time, which 
+        are the ones that know their period, are rendered
+        once including their release tail and mixed into
+        the blocks by offset, such that repeated notes 
+        are not synthesized again.
+
+        Args:
+            envelope (ADSR):  envelope of every note
+            max_voices (int): maximal number of notes that 
+                              are rendered per block, None
+                              for no limit
+            stealing (str):   which notes are dropped first
+                              if there are too many. 'oldest'
+                              drops the earliest notes, 
+                              'quietest' the ones with the 
+                              lowest level and 'release' the
+                              released ones before the oldest
+            threshold (float): level below which released
+                               notes are no longer rendered
+            voice_cache (int): bytes the rendered voices may
+                               take, 0 disables the cache
+        """
+        if stealing not in STEALING_POLICIES:
+            raise ValueError(f"stealing must be one of "
+                             f"{', '.join(STEALING_POLICIES)}")
+        if max_voices is not None and max_voices < 1:
+            raise ValueError("A Pitcher needs at least one voice")
+        if threshold <= 0:
+            raise ValueError("The threshold must be positive, released "
+                             "notes would never be culled otherwise")
         self.note_signal : nfunk | None = None
         self.signal : funk | None = None
+        self.envelope : ADSR = envelope if envelope is not None \
+                               else ADSR()
+        self.max_voices : int | None = max_voices
+        self.stealing : str = stealing
+        self.threshold : float = threshold
+        # Notes whose voice was stolen, as (start, semi tone)
+        # with the time in beats after which they are silent,
+        # and the samples [start, stop) of the last block. 
+        # Voices are only stolen for good while the blocks
+        # continue each other.
+        self._stolen : Dict[Tuple[float, int], float] = {}
+        self._block : Tuple[int, int] | None = None
+        self.voice_cache : int = voice_cache
+        self._voices : _voice_cache = _voice_cache(voice_cache)
 
     @property
     def repr(self) -> str:
-        repr = f"Pitcher()"
-        names_of_globals = _get_global_daw_objects()
-        name_of_self = names_of_globals.pop(self)
-        if self.note_signal:
-            if self.note_signal in names_of_globals:
-                repr += f"\n{self.note_signal}"
-                repr += f"\n{name_of_self} < {names_of_globals[self.note_signal]}"
-            else:
-                repr += f"\n{name_of_self} < {self.note_signal}"
-        if self.signal:
-            if self.signal in names_of_globals:
-                repr += f"\n{self.signal}"
-                repr += f"\n{name_of_self} < {names_of_globals[self.signal]}"
-            else:
-                repr += f"\n{name_of_self} < {self.signal}"
+        active_args = []
+        if self.envelope.__repr__() != "ADSR()":
+            active_args.append(f"envelope={self.envelope}")
+        if self.max_voices is not None:
+            active_args.append(f"max_voices={self.max_voices}")
+        if self.stealing != "oldest":
+            active_args.append(f"stealing=\"{self.stealing}\"")
+        if self.threshold != CULL_THRESHOLD:
+            active_args.append(f"threshold={self.threshold}")
+        if self.voice_cache != VOICE_CACHE_BYTES:
+            active_args.append(f"voice_cache={self.voice_cache}")
+        repr = f"Pitcher({', '.join(active_args)})"
+        name_of_self = _registry.name(self, generate=True)
+        for o in self._references():
+            repr += f"\n{name_of_self} < {_reference(o)}"
         return repr
 
+    def _references(self) -> List[daw_object]:
+        return [o for o in (self.note_signal, self.signal) 
+                if o is not None]
+
     def __lt__(self, other : nfunk | funk):
         """
         Makes a < b short hand for plugging in
@@ -298,56 +967,233 @@ class Pitcher(funk):
             self.note_signal = other
         elif isinstance(other, funk):
             self.signal = other
+            self._voices.validate(None)
         else:
             raise TypeError("Pitchers can only receive funks or note funks")
 
-    def f(self, t : np.ndarray | float) -> np.ndarray | float:
-        if self.note_signal is not None:
-            notes = self.note_signal()
-        else:
+    def _active_notes(
+        self, 
+        start : float, 
+        stop : float,
+        stolen : Dict[Tuple[float, int], float]
+    ) -> NoteArray:
+        """
+        Returns the notes sounding between the times
+        start and stop (in seconds). Released notes 
+        below the threshold are culled and at most 
+        max_voices notes are returned. The notes in
+        'stolen' stay silent, notes whose voice is 
+        stolen are added to it.
+        """
+        if self.note_signal is None:
             raise RuntimeError("Pitcher has no note signal")
+        tail = self.envelope.tail(self.threshold)
+        notes = self.note_signal.notes_between(start / 60 * BPM, 
+                                               stop / 60 * BPM,
+                                               tail / 60 * BPM)
+        if not len(notes):
+            return notes
+        starts = notes.start / BPM * 60
+        ends = notes.end / BPM * 60
+        level = self.envelope.level_at(start, starts, ends)
+        released = ends < start
+        audible = ~released | (level >= self.threshold)
+        if stolen:
+            # Stolen voices stay silent in later blocks
+            now = start / 60 * BPM
+            for k in [k for k, e in stolen.items() if e < now]:
+                del stolen[k]
+            audible &= np.array([k not in stolen for k in zip(
+                notes.start.tolist(), notes.st.tolist()
+            )], dtype=bool)
+        notes = notes[audible]
+        if self.max_voices is None or len(notes) <= self.max_voices:
+            return notes
+        starts = starts[audible]
+        level = level[audible]
+        released = released[audible]
+        # Notes starting within the block are rated by 
+        # their peak level
+        loudness = np.where(starts < start, level, 1) * notes.velocity
+        if self.stealing == "oldest":
+            order = np.argsort(starts, kind="stable")
+        elif self.stealing == "quietest":
+            order = np.argsort(loudness, kind="stable")
+        else:
+            order = np.lexsort((starts, ~released))
+        dropped = notes[order[:len(notes) - self.max_voices]]
+        for key, end in zip(zip(dropped.start.tolist(), dropped.st.tolist()),
+                            (dropped.end + tail / 60 * BPM).tolist()):
+            stolen[key] = end
+        return notes[np.sort(order[len(notes) - self.max_voices:])]
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        first = block_start(t)
+        uniform = first is not None
         t = np.atleast_1d(t)
-        s = np.zeros_like(t)
-        for note in notes:
-            if note.start / BPM * 60 > t[-1]:
-                continue
-            if (note.start + note.duration) / BPM * 60 + 0.5 < t[0]:
-                continue
-            if self.signal is not None:
-                s += self.signal((t - note.start) * 
-                                 note.frequency / frequency(0)) \
-                  * note.velocity * NoteIndicator(note)(t)
-            else:
-                raise RuntimeError("Pitcher has no input signal")
-        return s
+        if first is None:
+            # Times outside of the blocks steal no voices
+            # for the blocks
+            stolen = dict(self._stolen)
+        else:
+            if self._block is None or first not in self._block:
+                # The block neither continues nor repeats
+                # the last one, for example after a reset
+                self._stolen.clear()
+            self._block = (first, first + t.shape[0])
+            stolen = self._stolen
+        notes = self._active_notes(t[0], t[-1], stolen)
+        if not len(notes):
+            return np.zeros_like(t)
+        if self.signal is None:
+            raise RuntimeError("Pitcher has no input signal")
+        if self._cached(t):
+            return self._mix_voices(t, notes)
+        # Envelopes and velocities of all notes in one pass
+        gain = self.envelope(t, 
+                             notes.start / BPM * 60, 
+                             notes.end / BPM * 60,
+                             uniform)
+        gain *= notes.velocity[:, None]
+        voices = np.empty(gain.shape, dtype=t.dtype)
+        for i, (start, ratio) in enumerate(
+            zip(notes.start / BPM * 60, notes.frequency / frequency(0))
+        ):
+            voices[i] = self.signal((t - start) * ratio)
+        return np.einsum("kn,kn->n", voices, gain)
+
+    def _cached(self, t : np.ndarray) -> bool:
+        """
+        Whether the block t is mixed from cached voices
+        """
+        if self.voice_cache <= 0 or self.signal is None \
+           or block_start(t) is None:
+            return False
+        if self.envelope.tail(self.threshold) == float("inf"):
+            return False
+        # Signals with a known period are pure functions
+        # of time, other ones might hold state or noise
+        return self.signal.period is not None
+
+    def _voice(
+        self,
+        st : int,
+        duration : float,
+        velocity : float,
+        offset : float
+    ) -> np.ndarray:
+        """
+        Returns the voice of a note, sampled from 'offset'
+        samples after its start until the end of its tail
+        """
+        dtype = evaluation_dtype()
+        key = (st, duration, velocity, offset, dtype)
+        voice = self._voices.get(key)
+        if voice is not None:
+            return voice
+        tail = self.envelope.tail(self.threshold)
+        samples = max(0, ceil((duration + tail) * SAMPLERATE - offset))
+        dt = (np.arange(samples) + offset) / SAMPLERATE
+        voice = np.empty(samples, dtype=dtype)
+        voice[...] = self.signal(dt * frequency(st) / frequency(0))
+        # Voices differ in length, their envelopes are not
+        # built from the tables of the blocks
+        voice *= self.envelope(dt, np.zeros(1), np.full(1, duration),
+                               False)[0]
+        voice *= velocity
+        self._voices.put(key, voice)
+        return voice
+
+    def _mix_voices(
+        self, 
+        t : np.ndarray, 
+        notes : NoteArray
+    ) -> np.ndarray:
+        """
+        Adds the slices of the cached voices that 
+        overlap the block t
+        """
+        # The code of the signal changes with its parameters
+        self._voices.validate((_fingerprint(self.signal),
+                               repr(self.envelope), self.threshold),
+                              self.voice_cache)
+        first = block_start(t)
+        n = t.shape[0]
+        out = np.zeros_like(t)
+        # Start samples of the notes, rounded such that
+        # repeated notes share their sub-sample offset
+        starts = np.round(notes.start / BPM * 60 * SAMPLERATE, 6)
+        for st, start, duration, velocity in zip(
+            notes.st.tolist(), starts.tolist(), 
+            (notes.duration / BPM * 60).tolist(), notes.velocity.tolist()
+        ):
+            begin = ceil(start)
+            voice = self._voice(st, duration, velocity, 
+                                round(begin - start, 6))
+            lo = max(begin, first)
+            hi = min(begin + voice.shape[0], first + n)
+            if lo < hi:
+                out[lo - first:hi - first] += voice[lo - begin:hi - begin]
+        return out
 
 
 class Sequencer(nfunk):
     """
     Equidistant note sequencer
     """
+    # The sequence as note array, its index and the
+    # version they were built for
+    _pattern : NoteArray | None = None
+    _pattern_index : NoteIndex | None = None
+    _pattern_version : Any = None
+    # Arrays and key of notes of a binary project,
+    # which are not read yet
+    _source : Tuple[Mapping[str, np.ndarray], str] | None = None
+
     def __init__(self, 
                  num_notes : int = 16, 
                  note_length : float = 1/8, 
-                 repeats : int = 1024,
+                 repeats : int | None = 1024,
                  sequence : List[Note] | None = None):
         """
         Note: First 2 parameters are overwritten if 
-        sequence is given
+        sequence is given. With repeats=None the 
+        sequence repeats forever.
         """
         self.repeats : int = repeats
         if sequence is None:
             self._num_notes : int = num_notes
             self._note_length : float = note_length
-            self._sequence : List[Note] = [Note(start=note_length * i,
-                                           duration=note_length)
-                                           for i in range(num_notes)]
+            self._sequence : List[Note] = _note_list(
+                Note(start=note_length * i, duration=note_length)
+                for i in range(num_notes)
+            )
         else:
             self._check_sequence_validity(sequence)
-            self._sequence : List[Note] = sequence
+            self._sequence : List[Note] = _note_list(sequence)
             self._num_notes : int = len(sequence)
             self._note_length : float = sequence[0].duration
 
+    @classmethod
+    def from_arrays(cls,
+                    arrays : Mapping[str, np.ndarray],
+                    key : str,
+                    num_notes : int,
+                    note_length : float,
+                    repeats : int | None = 1024) -> Sequencer:
+        """
+        Builds a sequencer from the notes packed into
+        the arrays 'key_*' of a binary project. The 
+        arrays are only read once the notes are needed.
+        """
+        sequencer = cls.__new__(cls)
+        sequencer.repeats = repeats
+        sequencer._num_notes = num_notes
+        sequencer._note_length = note_length
+        sequencer._sequence = None
+        sequencer._source = (arrays, key)
+        return sequencer
+
     def _check_sequence_validity(self, sequence: List[Note]):
         if not all([isinstance(note, Note)
                     for note 
@@ -369,10 +1215,27 @@ class Sequencer(nfunk):
             raise TypeError("All notes of the sequence given to a "
                             "equidistant sequencer must be contiguous")
 
+    @property
+    def version(self) -> Any:
+        """
+        The notes only depend on the repeats and
+        the sequence, which changes with every edit
+        of a note or of the sequence
+        """
+        return (self.repeats, self._source is None, Note._edits)
+
     @property
     def repr(self) -> str:
+        arrays = _array_store()
+        if arrays is not None:
+            key = f"notes{len(arrays)}"
+            for column, array in _pack_notes(self.sequence).items():
+                arrays[f"{key}_{column}"] = array
+            return (f"Sequencer.from_arrays(__arrays__, \"{key}\", "
+                    f"{self._num_notes}, {self._note_length}, "
+                    f"repeats={self.repeats})")
         repr = f"Sequencer(repeats={self.repeats}, sequence=[\n"
-        for note in self._sequence:
+        for note in self.sequence:
             repr += f"    {note},\n"
         repr += "])"
         return repr
@@ -390,9 +1253,11 @@ class Sequencer(nfunk):
         Note: Overrides existing note sequence
         """
         self._num_notes = num_notes
-        self._sequence = [Note(start=self._note_length * i,
-                               duration=self._note_length)
-                          for i in range(num_notes)]
+        self._sequence = _note_list(Note(start=self._note_length * i,
+                                         duration=self._note_length)
+                                    for i in range(num_notes))
+        self._source = None
+        Note._edits += 1
 
     @property
     def note_length(self) -> float:
@@ -410,26 +1275,124 @@ class Sequencer(nfunk):
         length
         """
         self._note_length = note_length
-        for i, note in enumerate(self._sequence):
+        for i, note in enumerate(self.sequence):
             note.start = note_length * i
             note.duration = note_length
 
     @property
     def sequence(self):
+        if self._sequence is None:
+            self._sequence = _note_list(_unpack_notes(*self._source))
+            self._source = None
         return self._sequence
 
     @sequence.setter
     def sequence(self, sequence):
         """
-        Sets the sequence
+        Sets the sequence. The sequencer keeps a copy 
+        of the list, changes of the sequence are made
+        through this property.
         """
         self._check_sequence_validity(sequence)
-        self._sequence = sequence
+        self._sequence = _note_list(sequence)
+        self._source = None
+        Note._edits += 1
     
+    @property
+    def period(self) -> float:
+        """
+        Length of one repetition of the sequence
+        in beats
+        """
+        return self.num_notes * self.note_length
+
+    @property
+    def pattern(self) -> NoteArray:
+        """
+        The sequence as note array, which is only
+        rebuilt if the sequence changed
+        """
+        version = self.version
+        if self._pattern is None or version != self._pattern_version:
+            if self._sequence is None:
+                arrays, key = self._source
+                self._pattern = NoteArray(arrays[f"{key}_st"], 
+                                          arrays[f"{key}_start"],
+                                          arrays[f"{key}_duration"],
+                                          arrays[f"{key}_velocity"])
+            else:
+                self._pattern = NoteArray.from_notes(self._sequence)
+            self._pattern_index = NoteIndex(self._pattern)
+            self._pattern_version = version
+        return self._pattern
+
+    def repetitions(self, first : int, last : int) -> NoteArray:
+        """
+        Returns the notes of the repetitions first 
+        to last (inclusive)
+        """
+        pattern = self.pattern
+        if last < first:
+            return NoteArray()
+        offsets = np.arange(first, last + 1) * self.period
+        return NoteArray(np.tile(pattern.st, offsets.shape[0]),
+                         (offsets[:, None] + pattern.start).ravel(),
+                         np.tile(pattern.duration, offsets.shape[0]),
+                         np.tile(pattern.velocity, offsets.shape[0]))
+
     def f(self) -> List[Note]:
-        return [n * float(i * self.num_notes * self.note_length) 
+        if self.repeats is None:
+            raise ValueError("An endlessly repeating sequencer "
+                             "has no finite note list")
+        # The notes are copies of the sequence, such that 
+        # they keep the spelling they were written with
+        period = self.period
+        return [Note._make(n.st, n.start + i * period, n.duration, 
+                           n.velocity, n._note_string)
                 for i in range(self.repeats) 
                 for n in self.sequence]
+
+    def notes_between(
+        self, 
+        start : float, 
+        stop : float, 
+        tail : float = 0.0
+    ) -> NoteArray:
+        """
+        Returns the notes that start before 'stop' and
+        end (plus 'tail') after 'start'. Only the notes
+        of the repetitions that can overlap the window
+        are generated, which are found by a binary 
+        search over the sorted pattern.
+        """
+        period = self.period
+        if not len(self.pattern) or period <= 0:
+            return NoteArray()
+        index = self._pattern_index
+        notes = index.notes
+        # Notes with an endless tail sound from the first
+        # repetition on
+        first = 0 if tail == float("inf") else \
+                max(0, floor((start - tail - index.end) / period))
+        last = floor((stop - notes.start[0]) / period)
+        if self.repeats is not None:
+            last = min(last, self.repeats - 1)
+        if last < first:
+            return NoteArray()
+        offsets = np.arange(first, last + 1) * period
+        lo = np.searchsorted(notes.start, 
+                             start - tail - index.max_duration - offsets,
+                             "left")
+        hi = np.searchsorted(notes.start, stop - offsets, "right")
+        counts = np.maximum(hi - lo, 0)
+        # Pattern index and repetition of every generated note
+        repetition = np.repeat(np.arange(offsets.shape[0]), counts)
+        idx = np.arange(counts.sum()) + np.repeat(lo - np.cumsum(counts) 
+                                                  + counts, counts)
+        return NoteArray(notes.st[idx],
+                         notes.start[idx] + offsets[repetition],
+                         notes.duration[idx],
+                         notes.velocity[idx]).between(start, stop, tail)
     
     def __len__(self):
         return self._num_notes
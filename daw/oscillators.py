@@ -1,18 +1,46 @@
 import numpy as np
 from numpy._core.multiarray import ndarray
-from .base import funk, SAMPLERATE
+from fractions import Fraction
+from .base import funk, SAMPLERATE, evaluation_dtype, _lcm
 from typing import *
 
+def _phase(freq : float, t : np.ndarray | float) -> np.ndarray | float:
+    """
+    Returns the phase freq * t wrapped into [0, 1) 
+    in the evaluation dtype. The wrapping happens in 
+    float64, so the phase stays exact for long running 
+    evaluations in float32.
+    """
+    return np.mod(freq * t, 1).astype(evaluation_dtype(), copy=False)
+
+def _period(freq : float) -> Fraction | None:
+    """
+    Returns the exact period in seconds of an 
+    oscillator with frequency 'freq'
+    """
+    try:
+        freq = abs(Fraction(freq))
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return 1 / freq if freq else None
+
 class square(funk):
     """
     Square wave oscillator
     """
     def __init__(self, freq : float):
         self.freq = freq
-        self._repr = f"square({self.freq})"
+
+    @property
+    def repr(self) -> str:
+        return f"square({self.freq})"
 
     def f(self, t : np.ndarray | float) -> np.ndarray | float:
-        return np.sign(np.sin(2 * np.pi * self.freq * t))
+        return np.sign(np.sin(2 * np.pi * _phase(self.freq, t)))
+
+    @property
+    def period(self) -> Fraction | None:
+        return _period(self.freq)
     
 class sine(funk):
     """
@@ -20,10 +48,17 @@ class sine(funk):
     """
     def __init__(self, freq : float):
         self.freq = freq
-        self._repr = f"sine({self.freq})"
+
+    @property
+    def repr(self) -> str:
+        return f"sine({self.freq})"
 
     def f(self, t : np.ndarray | float) -> np.ndarray | float:
-        return np.sin(2 * np.pi * self.freq * t)
+        return np.sin(2 * np.pi * _phase(self.freq, t))
+
+    @property
+    def period(self) -> Fraction | None:
+        return _period(self.freq)
 
 class saw(funk):
     """
@@ -31,10 +66,179 @@ class saw(funk):
     """
     def __init__(self, freq):
         self.freq = freq
-        self._repr = f"saw({self.freq})"
+
+    @property
+    def repr(self) -> str:
+        return f"saw({self.freq})"
 
     def f(self, t : np.ndarray | float) -> np.ndarray | float:
-        return 2 * (t * self.freq - np.floor(t * self.freq)) - 1
+        return 2 * _phase(self.freq, t) - 1
+
+    @property
+    def period(self) -> Fraction | None:
+        return _period(self.freq)
+
+WAVETABLE_SIZE = 2048
+WAVETABLE_INTERPOLATION = "linear"
+SINE_TABLE = np.sin(2 * np.pi * np.arange(WAVETABLE_SIZE) / WAVETABLE_SIZE)
+SQUARE_TABLE = np.sign(SINE_TABLE)
+SAW_TABLE = 2 * np.arange(WAVETABLE_SIZE) / WAVETABLE_SIZE - 1
+
+class wavetable(funk):
+    """
+    Wavetable oscillator that plays a precomputed
+    single cycle table. The phase is used as index 
+    into the table and values between the table 
+    entries are interpolated linearly or cubicly.
+    """
+    default_table : np.ndarray = SINE_TABLE
+
+    def __init__(self, 
+                 freq : float, 
+                 table : Sequence[float] | np.ndarray | None = None,
+                 interpolation : str = WAVETABLE_INTERPOLATION):
+        if interpolation not in {"linear", "cubic"}:
+            raise ValueError("interpolation must be 'linear' "
+                             "or 'cubic'")
+        self.freq = freq
+        self.interpolation = interpolation
+        self._default_table : bool = table is None
+        if table is None:
+            table = self.default_table
+        self.table = np.asarray(table, dtype=float)
+        if self.table.ndim != 1 or self.table.shape[0] < 2:
+            raise ValueError("A wavetable must be a one dimensional "
+                             "table of at least 2 values")
+        # One value before and two values after the cycle,
+        # such that interpolation never has to wrap around
+        self._padded = np.concatenate([self.table[-1:], 
+                                       self.table, 
+                                       self.table[:2]])
+        self._padded_by_dtype : Dict[np.dtype, np.ndarray] = {}
+
+    @property
+    def repr(self) -> str:
+        active_args = [f"{self.freq}"]
+        if not self._default_table:
+            active_args.append(f"table={self.table.tolist()}")
+        if self.interpolation != WAVETABLE_INTERPOLATION:
+            active_args.append(f"interpolation=\"{self.interpolation}\"")
+        return f"{type(self).__name__}({', '.join(active_args)})"
+
+    @property
+    def period(self) -> Fraction | None:
+        return _period(self.freq)
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        dtype = evaluation_dtype()
+        if dtype not in self._padded_by_dtype:
+            self._padded_by_dtype[dtype] = self._padded.astype(dtype)
+        padded = self._padded_by_dtype[dtype]
+        position = np.mod(self.freq * np.asarray(t), 1) \
+                 * self.table.shape[0]
+        i = position.astype(np.intp)
+        x = (position - i).astype(dtype, copy=False)
+        # The phase of tiny negative times rounds up to
+        # exactly 1, which is the start of the cycle
+        i %= self.table.shape[0]
+        p1 = padded[i + 1]
+        p2 = padded[i + 2]
+        if self.interpolation == "linear":
+            return p1 + x * (p2 - p1)
+        # Catmull-Rom spline through the 4 neighbours
+        p0 = padded[i]
+        p3 = padded[i + 3]
+        return p1 + 0.5 * x * (
+            p2 - p0 + x * (2 * p0 - 5 * p1 + 4 * p2 - p3 
+                           + x * (3 * (p1 - p2) + p3 - p0))
+        )
+
+class wsine(wavetable):
+    """
+    Sine wave wavetable oscillator
+    """
+    default_table = SINE_TABLE
+
+class wsquare(wavetable):
+    """
+    Square wave wavetable oscillator
+    """
+    default_table = SQUARE_TABLE
+
+class wsaw(wavetable):
+    """
+    Saw wave wavetable oscillator
+    """
+    default_table = SAW_TABLE
+
+class harmonic_bank(funk):
+    """
+    Weighted sum of the harmonics of a base signal,
+    where the k-th weight belongs to the frequency
+    k * freq. 
+    
+    Sine harmonics are generated all at once with the 
+    recurrence sin((k + 1)x) = 2cos(x)sin(kx) - sin((k - 1)x),
+    which needs a single sin and cos per sample. Other 
+    base signals are accumulated harmonic by harmonic 
+    into a single result array.
+    """
+    def __init__(self, 
+                 freq : float, 
+                 weights : Sequence[float],
+                 base_signal : Type[funk] = sine):
+        self.freq = freq
+        self.weights = np.asarray(weights, dtype=float)
+        if self.weights.ndim != 1 or self.weights.shape[0] < 1:
+            raise ValueError("A harmonic bank needs at least "
+                             "one weight")
+        self.base_signal = base_signal
+        self._harmonics = [base_signal(k * freq) for k 
+                           in range(1, self.weights.shape[0] + 1)]
+        self._weights_by_dtype : Dict[np.dtype, np.ndarray] = {}
+
+    @property
+    def repr(self) -> str:
+        repr = f"harmonic_bank({self.freq}, weights={self.weights.tolist()}"
+        if self.base_signal is not sine:
+            repr += f", base_signal={self.base_signal.__name__}"
+        return repr + ")"
+
+    @property
+    def period(self) -> Fraction | None:
+        return _lcm(h.period for h in self._harmonics)
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        # Weights in the evaluation dtype, such that 
+        # float32 evaluations are not promoted
+        dtype = evaluation_dtype()
+        if dtype not in self._weights_by_dtype:
+            self._weights_by_dtype[dtype] = self.weights.astype(dtype)
+        weights = self._weights_by_dtype[dtype]
+        if self.base_signal is not sine:
+            result = np.multiply(np.atleast_1d(self._harmonics[0](t)), 
+                                 weights[0], dtype=dtype)
+            scratch = np.empty_like(result)
+            for w, h in zip(weights[1:], self._harmonics[1:]):
+                np.multiply(np.atleast_1d(h(t)), w, out=scratch)
+                result += scratch
+            return result if np.ndim(t) else result[0]
+        x = np.atleast_1d(_phase(self.freq, t))
+        x *= 2 * np.pi
+        two_cos = np.cos(x)
+        two_cos *= 2
+        previous = np.zeros_like(x)
+        current = np.sin(x)
+        result = np.multiply(current, weights[0])
+        scratch = np.empty_like(x)
+        for w in weights[1:]:
+            # previous becomes sin((k + 1)x)
+            np.multiply(two_cos, current, out=scratch)
+            np.subtract(scratch, previous, out=previous)
+            previous, current = current, previous
+            np.multiply(current, w, out=scratch)
+            result += scratch
+        return result if np.ndim(t) else result[0]
 
 class decay(funk):
     """
@@ -42,7 +246,10 @@ class decay(funk):
     """
     def __init__(self, amount):
         self.amount = amount
-        self._repr = f"decay({self.amount})"
+
+    @property
+    def repr(self) -> str:
+        return f"decay({self.amount})"
 
     def f(self, t : np.ndarray | float) -> np.ndarray | float:
         return np.exp(-self.amount * t)
@@ -0,0 +1,194 @@
+"""
+Caching of periodic funks
+"""
+from __future__ import annotations
+
+import numpy as np
+import threading
+import weakref
+from collections import OrderedDict
+from fractions import Fraction
+from .base import funk, block_start, evaluation_dtype, SAMPLERATE, ATOM
+from .utils import _registry, _reference, _fingerprint
+from typing import *
+
+# Memory all rendered periods may take together
+PERIOD_CACHE_BYTES = 64 * 2**20
+
+def sample_period(period : Fraction) -> int:
+    """
+    Returns the shortest whole number of samples
+    that is a multiple of the period in seconds
+    """
+    return (period * SAMPLERATE).numerator
+
+class _period_buffers:
+    """
+    Least recently used store of the rendered periods,
+    keyed by (id of the source, samples, dtype). The
+    buffers of a source are dropped once it is garbage
+    collected.
+    """
+    def __init__(self, budget : int = PERIOD_CACHE_BYTES):
+        self.budget : int = budget
+        self.buffers : OrderedDict[Tuple[int, int, np.dtype],
+                                   np.ndarray] = OrderedDict()
+        self.bytes : int = 0
+        self.watched : Set[int] = set()
+        self.lock = threading.Lock()
+
+    def get(
+        self,
+        key : Tuple[int, int, np.dtype]
+    ) -> np.ndarray | None:
+        """
+        Returns the buffer of key, if it is stored
+        """
+        with self.lock:
+            buffer = self.buffers.get(key)
+            if buffer is not None:
+                self.buffers.move_to_end(key)
+            return buffer
+
+    def put(
+        self,
+        source : funk,
+        key : Tuple[int, int, np.dtype],
+        buffer : np.ndarray
+    ):
+        """
+        Stores the buffer and evicts the least recently
+        used ones until the store fits the budget
+        """
+        with self.lock:
+            previous = self.buffers.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self.buffers[key] = buffer
+            self.bytes += buffer.nbytes
+            while self.bytes > self.budget:
+                _, evicted = self.buffers.popitem(last=False)
+                self.bytes -= evicted.nbytes
+            if id(source) not in self.watched:
+                self.watched.add(id(source))
+                weakref.finalize(source, self.drop, id(source))
+
+    def drop(self, source_id : int):
+        """
+        Drops all buffers of the source with id 'source_id'
+        """
+        with self.lock:
+            for key in [k for k in self.buffers if k[0] == source_id]:
+                self.bytes -= self.buffers.pop(key).nbytes
+            self.watched.discard(source_id)
+
+    def clear(self):
+        """
+        Drops all buffers
+        """
+        with self.lock:
+            self.buffers.clear()
+            self.bytes = 0
+
+period_buffers = _period_buffers()
+
+class period_cache(funk):
+    """
+    Plays a periodic funk from a buffer. One period of
+    the source is rendered once, the blocks of a player
+    are then slices of the buffer, which extends one
+    block beyond the period, such that no block has to
+    wrap around.
+
+    The buffer is rendered again whenever the code of
+    the source changes, such that edited parameters
+    are heard. With a detected period, the period is
+    detected again then.
+
+    The period is rounded up to whole samples by taking
+    the shortest multiple of it that is a whole number
+    of samples. Only frequencies that are exact as
+    fractions give short periods, 220 or 1/8 do, while
+    semitone frequencies like 261.6255653005986 give
+    periods far beyond the memory budget. Buffers that
+    do not fit the budget are not cached and the source
+    is evaluated as usual.
+
+    Args:
+        source (funk): periodic signal
+        period:        period in seconds, detected from
+                       the source if not given
+    """
+    def __init__(self,
+                 source : funk,
+                 period : Fraction | float | str | None = None):
+        self.source : funk = source
+        self._given : bool = period is not None
+        if period is None:
+            period = source.period
+            if period is None:
+                raise ValueError("The source is not known to be "
+                                 "periodic, pass its period")
+        else:
+            period = Fraction(period)
+        if period <= 0:
+            raise ValueError("The period must be positive")
+        self._period : Fraction | None = period
+        self.samples : int | None = sample_period(period)
+        # Code of the source the buffers were rendered for
+        self._fingerprint : str = _fingerprint(source)
+
+    @property
+    def period(self) -> Fraction | None:
+        return self._period
+
+    def _validate(self):
+        """
+        Drops the buffers of the source if its code
+        changed since they were rendered
+        """
+        fingerprint = _fingerprint(self.source)
+        if fingerprint == self._fingerprint:
+            return
+        period_buffers.drop(id(self.source))
+        self._fingerprint = fingerprint
+        if not self._given:
+            self._period = self.source.period
+            self.samples = None if self._period is None \
+                           else sample_period(self._period)
+
+    def _references(self) -> List[funk]:
+        return [self.source]
+
+    @property
+    def repr(self) -> str:
+        source = _reference(self.source)
+        if _registry.name(self.source) is None \
+           and self.source._precedence < ATOM:
+            source = f"({source})"
+        period = f"\"{self._period}\"" if self._given else ""
+        return f"{source}.periodic({period})"
+
+    def f(self, t : np.ndarray | float) -> np.ndarray | float:
+        start = block_start(t)
+        if start is None:
+            return self.source(t)
+        self._validate()
+        if self.samples is None:
+            return self.source(t)
+        n = t.shape[0]
+        dtype = evaluation_dtype()
+        length = self.samples + n
+        if length * dtype.itemsize > period_buffers.budget:
+            return self.source(t)
+        key = (id(self.source), self.samples, dtype)
+        buffer = period_buffers.get(key)
+        if buffer is None or buffer.shape[0] < length:
+            buffer = np.empty(length, dtype=dtype)
+            buffer[...] = self.source(np.arange(length) / SAMPLERATE)
+            # Slices are handed out as block values,
+            # which must not be modified
+            buffer.flags.writeable = False
+            period_buffers.put(self.source, key, buffer)
+        offset = start % self.samples
+        return buffer[offset:offset + n]
@@ -0,0 +1,121 @@
+"""
+Rendering of player branches in worker processes
+"""
+from __future__ import annotations
+
+import numpy as np
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from .base import BLOCK_SIZE, SAMPLERATE, block_cache
+from typing import *
+
+# State of a worker process
+_branches : List[Callable] = []
+_rows : np.ndarray | None = None
+_memory : SharedMemory | None = None
+
+def _initialize(script : str, name : str, shape : Tuple[int, int], dtype : str):
+    """
+    Builds the branches from their script and attaches
+    the shared rows, runs once per worker process
+    """
+    global _branches, _rows, _memory
+    namespace : Dict[str, Any] = {}
+    exec(script, namespace)
+    _branches = namespace["__branches__"]
+    _memory = SharedMemory(name=name)
+    _rows = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_memory.buf)
+    # Forked workers would otherwise share the noise
+    np.random.seed()
+
+def _ready():
+    """
+    Returns once the worker process is initialized
+    """
+
+def _render(indices : List[int], start : int):
+    """
+    Renders the branches 'indices' of the block starting
+    at sample 'start' into their shared rows
+    """
+    t = (start + np.arange(_rows.shape[1], dtype=np.int64)) / SAMPLERATE
+    with block_cache.block(t, start, _rows.dtype):
+        for i in indices:
+            np.copyto(_rows[i], _branches[i](t), casting="same_kind")
+
+def _release(memory : SharedMemory, executors : List[ProcessPoolExecutor]):
+    """
+    Stops the workers and frees the shared memory
+    """
+    for executor in executors:
+        executor.shutdown(wait=True, cancel_futures=True)
+    memory.close()
+    memory.unlink()
+
+class process_pool:
+    """
+    Renders the branches of a player in worker processes.
+
+    The script that builds the branches is sent to every
+    worker once. Branch i always runs on worker
+    i % workers, so state kept by a branch stays in one
+    process. Per block only the start sample is sent, the
+    workers write their blocks straight into rows of a
+    shared memory buffer, which are summed at the end.
+    """
+    def __init__(self,
+                 script : str,
+                 branches : int,
+                 workers : int,
+                 dtype : np.dtype,
+                 block_size : int = BLOCK_SIZE):
+        dtype = np.dtype(dtype)
+        shape = (branches, block_size)
+        self.memory = SharedMemory(create=True,
+                                   size=max(1, branches * block_size
+                                               * dtype.itemsize))
+        self.rows = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf)
+        workers = max(1, min(workers, branches))
+        self.executors = [
+            ProcessPoolExecutor(max_workers=1,
+                                initializer=_initialize,
+                                initargs=(script, self.memory.name,
+                                          shape, dtype.str))
+            for _ in range(workers)
+        ]
+        self.assignment = [list(range(i, branches, workers))
+                           for i in range(workers)]
+        self._finalizer = weakref.finalize(self, _release,
+                                           self.memory, self.executors)
+        # The workers are forked by the first submission, 
+        # which happens here on the constructing thread. A
+        # failed initialization raises BrokenProcessPool.
+        try:
+            for future in [executor.submit(_ready) 
+                           for executor in self.executors]:
+                future.result()
+        except BaseException:
+            self.close()
+            raise
+
+    def render(self, start : int, out : np.ndarray) -> np.ndarray:
+        """
+        Renders the block starting at sample 'start'
+        and sums the branches into 'out'
+        """
+        futures = [executor.submit(_render, indices, start)
+                   for executor, indices
+                   in zip(self.executors, self.assignment)]
+        for future in futures:
+            future.result()
+        return np.sum(self.rows, axis=0, out=out)
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory
+        """
+        # The shared memory can only be closed without
+        # arrays pointing into it
+        self.rows = None
+        self._finalizer()
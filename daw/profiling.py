@@ -0,0 +1,155 @@
+"""
+Opt-in instrumentation of the evaluation of a player
+"""
+from __future__ import annotations
+
+import numpy as np
+import threading
+from time import perf_counter
+from .base import funk, BLOCK_SIZE, SAMPLERATE
+from .utils import _registry
+from typing import *
+
+# Upper edges of the render latency histogram in
+# milliseconds, the last bin holds all slower blocks
+LATENCY_BINS : Tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Flags of sounddevice.CallbackFlags that are counted
+STATUS_FLAGS : Tuple[str, ...] = ("output_underflow", "output_overflow",
+                                  "priming_output", "input_underflow",
+                                  "input_overflow")
+
+def _name(node : funk) -> str:
+    """
+    Returns the name a node is attributed by, which
+    is its global name or else the first line of its
+    repr
+    """
+    name = _registry.name(node)
+    if name is not None:
+        return name
+    try:
+        return node.repr.split("\n", 1)[0]
+    except Exception:
+        return f"<{type(node).__name__}>"
+
+class profiler:
+    """
+    Collects the evaluation time and call count of
+    every funk, attributed by its name, the render
+    latency of every block and the problems of the
+    output stream.
+
+    The time of a funk includes the funks it calls,
+    its self time excludes them. Only evaluations of
+    blocks rendered by the player are seen, process
+    workers are not profiled. The funks are only 
+    named when the stats are collected.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # funk -> [calls, time, self time]
+        self.funks : Dict[funk, List[float]] = {}
+        self.latencies : np.ndarray = np.zeros(len(LATENCY_BINS) + 1,
+                                               dtype=np.int64)
+        self.blocks : int = 0
+        self.total_latency : float = 0.0
+        self.max_latency : float = 0.0
+        # Blocks that took longer to render than to play
+        self.over_budget : int = 0
+        # Blocks that were done after the callback
+        # wanted to play them, callbacks without block
+        self.deadline_misses : int = 0
+        self.underruns : int = 0
+        self.status_flags : Dict[str, int] = {f: 0 for f in STATUS_FLAGS}
+
+    def evaluate(
+        self,
+        node : funk,
+        t : np.ndarray | float
+    ) -> np.ndarray | float:
+        """
+        Evaluates the node and attributes the time
+        """
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(0.0)
+        begin = perf_counter()
+        try:
+            return node.f(t)
+        finally:
+            elapsed = perf_counter() - begin
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self.lock:
+                entry = self.funks.get(node)
+                if entry is None:
+                    entry = self.funks[node] = [0, 0.0, 0.0]
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] += elapsed - children
+
+    def block(self, latency : float):
+        """
+        Records the render latency of a block in seconds
+        """
+        with self.lock:
+            self.blocks += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.latencies[np.searchsorted(LATENCY_BINS,
+                                           latency * 1000)] += 1
+            if latency > BLOCK_SIZE / SAMPLERATE:
+                self.over_budget += 1
+
+    def status(self, status : "sd.CallbackFlags"):
+        """
+        Counts the flags of a stream callback
+        """
+        with self.lock:
+            for flag in STATUS_FLAGS:
+                if getattr(status, flag, False):
+                    self.status_flags[flag] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the collected statistics, the funks
+        are sorted by their time
+        """
+        with self.lock:
+            entries = list(self.funks.items())
+        # Funks with the same name are attributed together
+        funks : Dict[str, List[float]] = {}
+        with _registry.naming():
+            for node, entry in entries:
+                total = funks.setdefault(_name(node), [0, 0.0, 0.0])
+                for i, value in enumerate(entry):
+                    total[i] += value
+        with self.lock:
+            labels = [f"<{b}ms" for b in LATENCY_BINS] \
+                   + [f">={LATENCY_BINS[-1]}ms"]
+            return {
+                "blocks": self.blocks,
+                "budget": BLOCK_SIZE / SAMPLERATE,
+                "mean_latency": self.total_latency / self.blocks
+                                if self.blocks else 0.0,
+                "max_latency": self.max_latency,
+                "latency_histogram": dict(zip(labels,
+                                              self.latencies.tolist())),
+                "over_budget": self.over_budget,
+                "deadline_misses": self.deadline_misses,
+                "underruns": self.underruns,
+                "status_flags": dict(self.status_flags),
+                "funks": [
+                    {"repr": name, "calls": calls,
+                     "time": time, "self_time": self_time}
+                    for name, (calls, time, self_time) in sorted(
+                        funks.items(), key=lambda i: -i[1][1]
+                    )
+                ],
+            }
+
+    def __repr__(self) -> str:
+        return "profiler()"
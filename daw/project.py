@@ -0,0 +1,118 @@
+"""
+Binary project files, which store the graph as
+script and the note and sample data as arrays
+"""
+from __future__ import annotations
+
+import numpy as np
+import os
+import tempfile
+import threading
+import weakref
+from .base import daw_object
+from .utils import _script, _storing_arrays
+from typing import *
+
+# Key of the graph script inside a project file
+GRAPH_KEY = "__graph__"
+
+class _project_arrays(Mapping[str, np.ndarray]):
+    """
+    Arrays of a project file that are only read once
+    they are accessed. The file is closed once no
+    object refers to the arrays anymore, or once they
+    are materialized because the file is overwritten.
+    """
+    # Identity instead of the comparison of all arrays
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __init__(self, path : str):
+        self.path : str = os.path.realpath(path)
+        self.file : np.lib.npyio.NpzFile | None = np.load(path)
+        self.arrays : Dict[str, np.ndarray] = {}
+        self.lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, self.file.close)
+        with _open_lock:
+            _open_projects.setdefault(self.path, weakref.WeakSet()).add(self)
+
+    def __getitem__(self, key : str) -> np.ndarray:
+        with self.lock:
+            if key not in self.arrays:
+                if self.file is None:
+                    raise KeyError(key)
+                self.arrays[key] = self.file[key]
+            return self.arrays[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.file.files if self.file is not None
+                    else self.arrays)
+
+    def __len__(self) -> int:
+        return len(self.file.files if self.file is not None
+                   else self.arrays)
+
+    def materialize(self):
+        """
+        Reads all arrays that were not read yet
+        and closes the file
+        """
+        with self.lock:
+            if self.file is None:
+                return
+            for key in self.file.files:
+                if key not in self.arrays:
+                    self.arrays[key] = self.file[key]
+            self.file = None
+            self._finalizer()
+
+# Lazily read projects by the real path of their file
+_open_projects : Dict[str, weakref.WeakSet[_project_arrays]] = {}
+_open_lock = threading.Lock()
+
+def save_project(o : daw_object, path : str):
+    """
+    Saves the code that generates 'o' into an
+    uncompressed .npz file. The notes of sequencers
+    and the impulse responses of convolutions are
+    stored as arrays, the script refers to them.
+
+    The file is written next to the target and then
+    moved over it, projects that are still read
+    lazily from the target read all their arrays
+    before.
+    """
+    arrays : Dict[str, np.ndarray] = {}
+    with _storing_arrays(arrays):
+        script = _script(o)
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".npz",
+                                     delete=False) as f:
+        temporary = f.name
+        try:
+            np.savez(f, **{GRAPH_KEY: np.array(script)}, **arrays)
+        except BaseException:
+            f.close()
+            os.remove(temporary)
+            raise
+    with _open_lock:
+        readers = list(_open_projects.pop(os.path.realpath(path), ()))
+    for reader in readers:
+        reader.materialize()
+    os.replace(temporary, path)
+
+def read_project(
+    path : str,
+    lazy : bool = True
+) -> Tuple[str, Mapping[str, np.ndarray]]:
+    """
+    Reads the script and the arrays of a project
+    file. Lazily read arrays are only loaded from
+    the file once they are accessed.
+    """
+    if not lazy:
+        with np.load(path) as file:
+            arrays = {k: file[k] for k in file.files}
+    else:
+        arrays = _project_arrays(path)
+    return str(arrays[GRAPH_KEY]), arrays
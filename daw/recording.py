@@ -0,0 +1,106 @@
+"""
+Bounded recording of the played signal
+"""
+from __future__ import annotations
+
+import numpy as np
+from .base import SAMPLERATE
+from typing import *
+
+class recorder:
+    """
+    Records the last 'seconds' of the played signal
+    into a preallocated buffer.
+
+    Without a path the samples are kept in an in
+    memory ring. The ring is stored twice in a row,
+    such that every range of at most 'seconds' length
+    is contiguous and can be read without copying.
+
+    With a path the samples are written into a memory
+    mapped file of 'seconds' length. The recording
+    stops once the file is full.
+    """
+    def __init__(self,
+                 seconds : float,
+                 path : str | None = None):
+        self.capacity : int = round(seconds * SAMPLERATE)
+        if self.capacity < 1:
+            raise ValueError("A recording must be at least "
+                             "one sample long")
+        self.path : str | None = path
+        if path is None:
+            self.buffer : np.ndarray = np.zeros(2 * self.capacity,
+                                                dtype=np.int16)
+        else:
+            self.buffer : np.ndarray = np.memmap(path,
+                                                 dtype=np.int16,
+                                                 mode="w+",
+                                                 shape=(self.capacity,))
+        # Number of samples written so far
+        self.position : int = 0
+
+    @property
+    def full(self) -> bool:
+        """
+        Whether a file recording reached its end
+        """
+        return self.path is not None and self.position >= self.capacity
+
+    def write(self, block : np.ndarray):
+        """
+        Appends a block of samples
+        """
+        n = block.shape[0]
+        if self.path is not None:
+            n = min(n, self.capacity - self.position)
+            self.buffer[self.position:self.position + n] = block[:n]
+            self.position += n
+            return
+        # Only the last 'capacity' samples of long blocks survive
+        if n > self.capacity:
+            self.position += n - self.capacity
+            block = block[n - self.capacity:]
+            n = self.capacity
+        start = self.position % self.capacity
+        first = min(n, self.capacity - start)
+        for offset in (0, self.capacity):
+            self.buffer[offset + start:offset + start + first] = block[:first]
+        # The rest wraps around to the start of the ring
+        if first < n:
+            self.buffer[:n - first] = block[first:]
+            self.buffer[self.capacity:self.capacity + n - first] = block[first:]
+        self.position += n
+
+    def read(self,
+             start : float = 0.0,
+             stop : float | None = None) -> np.ndarray:
+        """
+        Returns the recorded samples between the
+        times start and stop (in seconds since the
+        recording started) as a view
+
+        Note: The view of an in memory recording is
+        overwritten once the ring wraps around
+        """
+        first = round(start * SAMPLERATE)
+        last = self.position if stop is None \
+               else min(round(stop * SAMPLERATE), self.position)
+        oldest = max(0, self.position - self.capacity) \
+                 if self.path is None else 0
+        if first < oldest or first > last:
+            raise ValueError(f"Only the samples between {oldest} "
+                             f"and {self.position} are recorded")
+        if self.path is not None:
+            return self.buffer[first:last]
+        offset = first % self.capacity
+        return self.buffer[offset:offset + last - first]
+
+    def __len__(self) -> int:
+        return min(self.position, self.capacity)
+
+    def __repr__(self) -> str:
+        seconds = self.capacity / SAMPLERATE
+        if self.path is None:
+            return f"recorder({seconds})"
+        return f"recorder({seconds}, path=\"{self.path}\")"
@@ -0,0 +1,149 @@
+"""
+Sinks that stream rendered blocks into files
+"""
+from __future__ import annotations
+
+import numpy as np
+import wave
+from abc import ABC, abstractmethod
+from .base import SAMPLERATE
+from typing import *
+
+# Full scale values used to convert the
+# float signal into integer samples
+FULL_SCALE : Dict[np.dtype, int] = {
+    np.dtype(np.int16): 32767,
+    np.dtype(np.int32): 2147483647,
+}
+
+class sink(ABC):
+    """
+    Abstract base class of all sinks. Blocks are
+    written in order, one after another.
+    """
+    def __init__(self, path : str, dtype : str | np.dtype):
+        self.path : str = path
+        self.dtype : np.dtype = np.dtype(dtype)
+        self._buffer : np.ndarray = np.zeros(0, dtype=self.dtype)
+
+    def convert(self, block : np.ndarray) -> np.ndarray:
+        """
+        Converts a float block in [-1, 1] into the
+        sample format of the sink. The returned array
+        is a buffer of the sink.
+        """
+        if self._buffer.shape != block.shape:
+            self._buffer = np.zeros(block.shape, dtype=self.dtype)
+        if self.dtype in FULL_SCALE:
+            np.multiply(block, FULL_SCALE[self.dtype], 
+                        out=self._buffer, casting="unsafe")
+        else:
+            np.copyto(self._buffer, block, casting="unsafe")
+        return self._buffer
+
+    @abstractmethod
+    def write(self, block : np.ndarray):
+        """
+        Writes a float block in [-1, 1]
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        """
+        Finishes the file
+        """
+        raise NotImplementedError
+
+    def __enter__(self) -> sink:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class wav_sink(sink):
+    """
+    Writes integer PCM WAV files
+    """
+    def __init__(self, path : str, dtype : str | np.dtype = "int16"):
+        super().__init__(path, dtype)
+        if self.dtype not in FULL_SCALE:
+            raise ValueError("WAV files can only be written "
+                             "as int16 or int32")
+        self.file = wave.open(path, "wb")
+        self.file.setnchannels(1)
+        self.file.setsampwidth(self.dtype.itemsize)
+        self.file.setframerate(SAMPLERATE)
+
+    def write(self, block : np.ndarray):
+        self.file.writeframesraw(
+            self.convert(block).astype("<" + self.dtype.str[1:],
+                                       copy=False).data
+        )
+
+    def close(self):
+        self.file.close()
+
+class npy_sink(sink):
+    """
+    Writes into a memory mapped .npy file of
+    fixed length
+    """
+    def __init__(self,
+                 path : str,
+                 dtype : str | np.dtype = "float32",
+                 frames : int = 0):
+        super().__init__(path, dtype)
+        self.file = np.lib.format.open_memmap(path,
+                                              mode="w+",
+                                              dtype=self.dtype,
+                                              shape=(frames,))
+        self.position : int = 0
+
+    def write(self, block : np.ndarray):
+        stop = min(self.position + block.shape[0],
+                   self.file.shape[0])
+        self.file[self.position:stop] = self.convert(block)[
+            :stop - self.position
+        ]
+        self.position = stop
+
+    def close(self):
+        self.file.flush()
+        del self.file
+
+class raw_sink(sink):
+    """
+    Writes headerless samples
+    """
+    def __init__(self, path : str, dtype : str | np.dtype = "int16"):
+        super().__init__(path, dtype)
+        self.file = open(path, "wb")
+
+    def write(self, block : np.ndarray):
+        self.file.write(self.convert(block).data)
+
+    def close(self):
+        self.file.close()
+
+def open_sink(
+    path : str,
+    dtype : str | np.dtype = "int16",
+    frames : int = 0
+) -> sink:
+    """
+    Opens a sink according to the file extension
+    of 'path'.
+
+    Args:
+        path (str):   .wav, .npy or any other
+                      extension for raw samples
+        dtype:        sample format of the file
+        frames (int): number of samples, only
+                      needed for .npy files
+    """
+    if path.endswith(".wav"):
+        return wav_sink(path, dtype)
+    if path.endswith(".npy"):
+        return npy_sink(path, dtype, frames)
+    return raw_sink(path, dtype)
@@ -1,17 +1,196 @@
+from __future__ import annotations
+
 from .base import daw_object
 import __main__
+import threading
+import weakref
+from contextlib import contextmanager
 from typing import *
 
 def _indent_string(s : str, indent : int) -> str:
     """
     Indents a string by 'indent' spaces
     """
-    return "\n".join([(" " * indent) + line 
+    return "\n".join([(" " * indent) + line
                       for line in s.split("\n")])
 
-def _get_global_daw_objects() -> Dict[daw_object, str]:
+class _name_registry:
+    """
+    Weak registry of the names the daw objects have
+    inside the main namespace.
+
+    Names can only be found by scanning the main
+    namespace. The registry is kept across scans and
+    only the bindings that changed since the last scan
+    update it. Within 'naming' the namespace is scanned
+    once and all lookups are dictionary accesses, such
+    that serializing a graph of N nodes in a namespace
+    of M objects costs O(N + M) instead of O(N * M).
+    Objects that need a name to be serialized, but
+    have none, get a generated one.
+    """
+    def __init__(self):
+        self.names : weakref.WeakKeyDictionary[daw_object, str] = \
+            weakref.WeakKeyDictionary()
+        # Objects bound to the names at the last scan
+        self.bound : Dict[str, weakref.ref] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def refresh(self):
+        """
+        Updates the registry from the bindings of the
+        main namespace that changed since the last scan
+        """
+        current = {n: o for n, o in list(__main__.__dict__.items())
+                   if isinstance(o, daw_object)}
+        with self.lock:
+            for n in [n for n in self.bound if n not in current 
+                      or self.bound[n]() is not current[n]]:
+                o = self.bound.pop(n)()
+                if o is not None and self.names.get(o) == n:
+                    del self.names[o]
+            for n, o in current.items():
+                if n not in self.bound:
+                    self.bound[n] = weakref.ref(o)
+                    self.names.setdefault(o, n)
+            # Objects whose name was unbound keep
+            # another name they are bound to
+            for n, o in current.items():
+                self.names.setdefault(o, n)
+
+    @contextmanager
+    def naming(self):
+        """
+        Scans the main namespace once on entry and
+        reuses the names in nested calls
+        """
+        if getattr(self.local, "generated", None) is not None:
+            yield
+            return
+        self.refresh()
+        self.local.generated = {}
+        try:
+            yield
+        finally:
+            self.local.generated = None
+
+    @contextmanager
+    def anonymous(self):
+        """
+        Hides the names of the main namespace, such
+        that all objects are written out in full
+        """
+        previous = (getattr(self.local, "generated", None),
+                    getattr(self.local, "anonymous", False))
+        self.local.generated = {}
+        self.local.anonymous = True
+        try:
+            yield
+        finally:
+            self.local.generated, self.local.anonymous = previous
+
+    def name(
+        self,
+        o : daw_object,
+        generate : bool = False
+    ) -> str | None:
+        """
+        Returns the name of o, or a generated name if
+        o has none and 'generate' is set
+        """
+        generated = getattr(self.local, "generated", None)
+        if generated is None:
+            with self.naming():
+                return self.name(o, generate)
+        name = None if getattr(self.local, "anonymous", False) \
+               else self.names.get(o)
+        if name is not None:
+            return name
+        name = generated.get(id(o))
+        if name is None and generate:
+            name = f"_{type(o).__name__.lower()}{len(generated)}"
+            generated[id(o)] = name
+        return name
+
+_registry = _name_registry()
+
+_arrays = threading.local()
+
+@contextmanager
+def _storing_arrays(arrays : Dict[str, Any]):
+    """
+    Lets the reprs of the calling thread store large
+    arrays in 'arrays' and refer to them by their key
+    in a mapping called __arrays__ instead of writing
+    them out as code
+    """
+    previous = getattr(_arrays, "store", None)
+    _arrays.store = arrays
+    try:
+        yield
+    finally:
+        _arrays.store = previous
+
+def _array_store() -> Dict[str, Any] | None:
+    """
+    Returns the mapping arrays are stored in by
+    the reprs of the calling thread, if any
+    """
+    return getattr(_arrays, "store", None)
+
+def _reference(o : daw_object) -> str:
+    """
+    Returns the code that refers to o, which is
+    its name or else its repr
+    """
+    name = _registry.name(o)
+    return name if name is not None else o.repr
+
+def _fingerprint(o : daw_object) -> str:
+    """
+    Returns the code of o with all objects it refers
+    to written out, which changes with every parameter
+    of the graph that is part of the code
+    """
+    with _registry.anonymous():
+        return o.repr
+
+def _script(
+    *roots : daw_object,
+    expressions : bool = True
+) -> str:
     """
-    Returns all daw objects insed the main namespace
+    Builds the code that generates the roots together
+    with all named objects they refer to, in a single
+    topological pass over the graph. Every named object
+    is defined once, before the objects referring to it.
+
+    Args:
+        roots:              objects to generate
+        expressions (bool): whether unnamed roots are
+                            written as bare expressions
     """
-    return {o: n for n, o in __main__.__dict__.items() 
-                          if isinstance(o, daw_object)}
+    with _registry.naming():
+        lines = []
+        visited = set()
+        root_ids = {id(r) for r in roots}
+        stack : List[Tuple[daw_object, bool]] = [(r, False)
+                                                 for r in reversed(roots)]
+        while stack:
+            o, expanded = stack.pop()
+            if expanded:
+                name = _registry.name(o, generate=o._needs_name)
+                if name is not None:
+                    lines.append(f"{name} = {o.repr}")
+                elif expressions and id(o) in root_ids:
+                    lines.append(o.repr)
+                continue
+            if id(o) in visited:
+                continue
+            visited.add(id(o))
+            stack.append((o, True))
+            for r in reversed(list(o._references())):
+                if id(r) not in visited:
+                    stack.append((r, False))
+        return "\n".join(lines)